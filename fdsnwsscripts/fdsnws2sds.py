@@ -12,26 +12,110 @@ from __future__ import (absolute_import, division, print_function,
 
 import sys
 import os
+import mmap
 import optparse
 import datetime
 import random
 import subprocess
+import tempfile
+import multiprocessing
 import dateutil.parser
 
 from fdsnwsscripts.seiscomp import mseedlite, logs
 
 VERSION = "2018.011"
 
+NS = 1000000000
+
+# rough size of a Steim-compressed sample, including record overhead
+BYTES_PER_SAMPLE = 2
+
+# smallest miniSEED record length
+MIN_RECLEN = 256
+
+# data extents closer than this are planned as a single interval
+EXTENTS_MERGE_GAP = 10 * 60 * NS
+DAY_NS = 86400 * NS
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
 
 class Error(Exception):
     pass
 
 
+def to_ns(t):
+    d = t - _EPOCH
+    return (d.days * 86400 + d.seconds) * NS + d.microseconds * 1000
+
+
+def from_ns(t):
+    return _EPOCH + datetime.timedelta(microseconds=t // 1000)
+
+
+def parse_time(s):
+    # fast path for the fixed format used by FDSN web services
+    if len(s) >= 19 and s[4] == '-' and s[7] == '-' and s[10] == 'T' and \
+            s[13] == ':' and s[16] == ':':
+        try:
+            t = ((datetime.date(int(s[0:4]), int(s[5:7]), int(s[8:10])).toordinal() -
+                  _EPOCH_ORDINAL) * 86400 + int(s[11:13]) * 3600 +
+                 int(s[14:16]) * 60 + int(s[17:19])) * NS
+
+            frac = s[19:].rstrip('Z')
+
+            if not frac:
+                return t
+
+            if frac[0] == '.' and frac[1:].isdigit():
+                return t + int((frac[1:] + '000000000')[:9])
+
+        except ValueError:
+            pass
+
+    t = dateutil.parser.parse(s)
+
+    if t.tzinfo is not None:
+        t = t.astimezone(dateutil.tz.tzutc()).replace(tzinfo=None)
+
+    return to_ns(t)
+
+
 class Timespan(object):
-    def __init__(self, start, end):
+    __slots__ = ('start', 'current', 'end', 'samprate', 'pending')
+
+    def __init__(self, start, end, samprate):
         self.start = start
         self.current = start
         self.end = end
+        self.samprate = samprate
+        self.pending = []
+
+    def set_intervals(self, intervals):
+        if not intervals:
+            return False
+
+        (self.start, self.end) = intervals[0]
+        self.current = self.start
+        self.pending = intervals[1:]
+        return True
+
+    def next_interval(self):
+        return self.set_intervals(self.pending)
+
+    def window(self, max_timespan, max_bytes):
+        if max_bytes and self.samprate > 0:
+            span = int(max_bytes * NS / (self.samprate * BYTES_PER_SAMPLE))
+
+        else:
+            span = max_timespan * 60 * NS
+
+        # a window shorter than a second (eg., a small byte budget shared
+        # between many lines of a high-rate request) would never advance
+        span = max(span, NS)
+
+        return self.start + min(span, self.end - self.start)
 
 
 def exec_fetch(param, data, verbose, no_check):
@@ -68,7 +152,7 @@ def scan_sds(d, timespan, nets):
                 nets.add((net, int(year)))
 
             except ValueError:
-                logs.error("invalid SDS file:" + p, True)
+                logs.error("invalid SDS file: " + d + '/' + f)
                 continue
 
             if (net, sta, loc, cha) not in timespan:
@@ -84,16 +168,17 @@ def scan_sds(d, timespan, nets):
         for (loc, (doy, f)) in last_file.items():
             with open(d + '/' + f, 'rb') as fd:
                 nslc = tuple(f.split('.')[:4])
-                rec = mseedlite.Record(fd)
+                rec = mseedlite.Record(fd, header_only=True)
                 fd.seek(-rec.size, 2)
-                rec = mseedlite.Record(fd)
+                rec = mseedlite.Record(fd, header_only=True)
+                end_time = rec.end_ns
                 ts = timespan[nslc]
 
-                if ts.start < rec.end_time < ts.end:
-                    ts.start = rec.end_time
-                    ts.current = rec.end_time
+                if ts.start < end_time < ts.end:
+                    ts.start = end_time
+                    ts.current = end_time
 
-                elif rec.end_time >= ts.end:
+                elif end_time >= ts.end:
                     del timespan[nslc]
 
     def scan_sta(d):
@@ -115,6 +200,298 @@ def scan_sds(d, timespan, nets):
         scan_year(d + "/" + year)
 
 
+def last_begin(path):
+    # start time of the last record of a day file, assuming (like scan_sds)
+    # that it has the same length as the first one; None if the file cannot
+    # be read this way
+    try:
+        with open(path, 'rb') as fd:
+            rec = mseedlite.Record(fd, header_only=True)
+            fd.seek(-rec.size, 2)
+            return mseedlite.Record(fd, header_only=True).begin_ns
+
+    except (mseedlite.MSeedError, StopIteration, IOError, OSError, ValueError):
+        return None
+
+
+def write_day(path, recs, mode):
+    with open(path, mode) as fd:
+        for t in sorted(recs):
+            fd.write(recs[t].header)
+            fd.write(recs[t].data)
+
+
+def ingest_day(task):
+    (path, spool, chunks) = task
+    new = {}
+
+    with open(spool, 'rb') as fd:
+        buf = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+    for (offset, length) in chunks:
+        end = offset + length
+
+        try:
+            while offset < end:
+                rec = mseedlite.Record(buf, offset)
+                new.setdefault(rec.begin_ns, rec)
+                offset += rec.size
+
+        except mseedlite.MSeedError as e:
+            logs.error("%s: %s" % (path, str(e)))
+
+    if not new:
+        return
+
+    if not os.path.exists(path):
+        write_day(path, new, 'wb')
+        return
+
+    last = last_begin(path)
+
+    if last is not None and min(new) > last:
+        # the new records follow the existing ones
+        write_day(path, new, 'ab')
+        return
+
+    recs = {}
+
+    with open(path, 'rb') as fd:
+        try:
+            for rec in mseedlite.Input(fd, True):
+                recs.setdefault(rec.begin_ns, rec)
+
+        except mseedlite.MSeedError as e:
+            # do not rewrite (and truncate) a file that cannot be parsed
+            logs.error("%s: %s, appending new data" % (path, str(e)))
+            write_day(path, new, 'ab')
+            return
+
+    existing = len(recs)
+
+    for (t, rec) in new.items():
+        recs.setdefault(t, rec)
+
+    if len(recs) == existing:
+        return
+
+    write_day(path + '.tmp', recs, 'wb')
+    os.rename(path + '.tmp', path)
+
+
+def get_gaps(start, end, coverage, tolerance):
+    gaps = []
+
+    for (b, e) in coverage:
+        if e <= start:
+            continue
+
+        if b >= end:
+            break
+
+        if b - start > tolerance:
+            gaps.append((start, b))
+
+        start = max(start, e)
+
+    if end - start > tolerance:
+        gaps.append((start, end))
+
+    return gaps
+
+
+def sync_sds(d, timespan, nets):
+    coverage = {}
+    tolerance = {}
+
+    def scan_file(p, nslc):
+        ts = timespan[nslc]
+        spans = coverage.setdefault(nslc, [])
+
+        with open(p, 'rb') as fd:
+            try:
+                for rec in mseedlite.Input(fd, True):
+                    (begin_time, end_time) = (rec.begin_ns, rec.end_ns)
+
+                    if end_time <= ts.start or begin_time >= ts.end:
+                        continue
+
+                    spans.append((begin_time, end_time))
+
+                    if rec.fsamp > 0:
+                        tol = int(NS / rec.fsamp)
+                        tolerance[nslc] = max(tolerance.get(nslc, tol), tol)
+
+            except mseedlite.MSeedError as e:
+                logs.error("%s: %s" % (p, str(e)))
+
+    def scan_cha(d):
+        for f in os.listdir(d):
+            try:
+                (net, sta, loc, cha, ext, year, doy) = f.split('.')
+                day = (datetime.date(int(year), 1, 1).toordinal() -
+                       _EPOCH_ORDINAL + int(doy) - 1) * DAY_NS
+
+                nets.add((net, int(year)))
+
+            except ValueError:
+                logs.error("invalid SDS file: " + d + '/' + f)
+                continue
+
+            ts = timespan.get((net, sta, loc, cha))
+
+            if ts is None:
+                continue
+
+            if day + DAY_NS <= ts.start or day >= ts.end:
+                continue
+
+            scan_file(d + '/' + f, (net, sta, loc, cha))
+
+    def scan_sta(d):
+        for cha in os.listdir(d):
+            if not cha.endswith('.D'):
+                continue
+
+            scan_cha(d + '/' + cha)
+
+    def scan_net(d):
+        for sta in os.listdir(d):
+            scan_sta(d + '/' + sta)
+
+    def scan_year(d):
+        for net in os.listdir(d):
+            scan_net(d + '/' + net)
+
+    for year in os.listdir(d):
+        scan_year(d + "/" + year)
+
+    for (nslc, spans) in coverage.items():
+        spans.sort()
+        tol = tolerance.get(nslc, 0)
+        merged = []
+
+        for (b, e) in spans:
+            if merged and b - merged[-1][1] <= tol:
+                if e > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], e)
+
+            else:
+                merged.append((b, e))
+
+        ts = timespan[nslc]
+
+        if not ts.set_intervals(get_gaps(ts.start, ts.end, merged, tol)):
+            del timespan[nslc]
+
+
+def intersect(intervals, extents):
+    result = []
+    i = j = 0
+
+    while i < len(intervals) and j < len(extents):
+        start = max(intervals[i][0], extents[j][0])
+        end = min(intervals[i][1], extents[j][1])
+
+        if start < end:
+            result.append((start, end))
+
+        if intervals[i][1] < extents[j][1]:
+            i += 1
+
+        else:
+            j += 1
+
+    return result
+
+
+def read_extents(fd):
+    extents = {}
+
+    for line in fd:
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+
+            if not line.strip() or line.startswith('#'):
+                continue
+
+            tokens = line.split()
+
+            # an empty location code may be omitted
+            if len(tokens) % 2:
+                (net, sta, cha) = tokens[:3]
+                loc = ''
+
+            else:
+                (net, sta, loc, cha) = tokens[:4]
+
+            if loc == '--':
+                loc = ''
+
+            (start, end) = [parse_time(t) for t in tokens[-2:]]
+
+        except (ValueError, UnicodeDecodeError) as e:
+            logs.error("error parsing availability: %s" % str(e))
+            continue
+
+        extents.setdefault((net, sta, loc, cha), []).append((start, end))
+
+    return extents
+
+
+def get_availability(timespan, param, verbose, no_check):
+    postdata = ""
+
+    for ((net, sta, loc, cha), ts) in timespan.items():
+        if loc == '':
+            loc = '--'
+
+        postdata += "%s %s %s %s %sZ %sZ\n" \
+                    % (net, sta, loc, cha, from_ns(ts.start).isoformat(),
+                       from_ns(ts.pending[-1][1] if ts.pending else ts.end).isoformat())
+
+    if not isinstance(postdata, bytes):
+        postdata = postdata.encode('utf-8')
+
+    proc = exec_fetch(param, postdata, verbose, no_check)
+    extents = read_extents(proc.stdout)
+    proc.stdout.close()
+    proc.wait()
+
+    if proc.returncode != 0:
+        raise Error("error running fdsnws_fetch")
+
+    return extents
+
+
+def plan_extents(timespan, extents):
+    for (nslc, spans) in extents.items():
+        ts = timespan.get(nslc)
+
+        if ts is None:
+            continue
+
+        spans.sort()
+        merged = []
+
+        for (b, e) in spans:
+            if merged and b - merged[-1][1] <= EXTENTS_MERGE_GAP:
+                if e > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], e)
+
+            else:
+                merged.append((b, e))
+
+        if not ts.set_intervals(intersect([(ts.start, ts.end)] + ts.pending, merged)):
+            del timespan[nslc]
+
+    for nslc in timespan:
+        if nslc not in extents:
+            logs.info("no availability information for %s, using station epochs"
+                      % '.'.join(nslc))
+
+
 def get_citation(nets, param, verbose):
     postdata = ""
     for (net, year) in nets:
@@ -175,7 +552,8 @@ def main():
     param0 = ["-y", "station", "-q", "format=text", "-q", "level=network"]
     param1 = ["-y", "station", "-q", "format=text", "-q", "level=channel"]
     param2 = ["-y", "dataselect", "-z"]
-    times = {"starttime": datetime.datetime(1900, 1, 1), "endtime": datetime.datetime(2100, 1, 1)}
+    param3 = ["-y", "availability", "-z", "-q", "format=text", "-q", "merge=samplerate,quality"]
+    times = {"starttime": to_ns(datetime.datetime(1900, 1, 1)), "endtime": to_ns(datetime.datetime(2100, 1, 1))}
     nets = set()
 
     def add_param0(option, opt_str, value, parser):
@@ -190,10 +568,19 @@ def main():
         param2.append(opt_str)
         param2.append(value)
 
+    def add_param3(option, opt_str, value, parser):
+        param3.append(opt_str)
+        param3.append(value)
+
+    def add_param23(option, opt_str, value, parser):
+        add_param2(option, opt_str, value, parser)
+        add_param3(option, opt_str, value, parser)
+
     def add_param(option, opt_str, value, parser):
         add_param0(option, opt_str, value, parser)
         add_param1(option, opt_str, value, parser)
         add_param2(option, opt_str, value, parser)
+        add_param3(option, opt_str, value, parser)
 
     def add_time(option, opt_str, value, parser):
         add_param1(option, opt_str, value, parser)
@@ -207,7 +594,7 @@ def main():
         if t.tzinfo is not None:
             t = t.astimezone(dateutil.tz.tzutc()).replace(tzinfo=None)
 
-        times[option.dest] = t
+        times[option.dest] = to_ns(t)
 
     parser = optparse.OptionParser(
             usage="Usage: %prog [-h|--help] [OPTIONS] -o directory",
@@ -220,7 +607,8 @@ def main():
             retry_wait=60,
             threads=5,
             max_lines=1000,
-            max_timespan=1440)
+            max_timespan=1440,
+            processes=1)
 
     parser.add_option("-v", "--verbose", action="store_true", default=False,
                       help="verbose mode")
@@ -270,11 +658,11 @@ def main():
                       help="maximum number of download threads (default %default)")
 
     parser.add_option("-c", "--credentials-file", type="string", action="callback",
-                      callback=add_param2,
+                      callback=add_param23,
                       help="URL,user,password file (CSV format) for queryauth")
 
     parser.add_option("-a", "--auth-file", type="string", action="callback",
-                      callback=add_param2,
+                      callback=add_param23,
                       help="file that contains the auth token")
 
     parser.add_option("-o", "--output-dir", type="string",
@@ -286,6 +674,30 @@ def main():
     parser.add_option("-m", "--max-timespan", type="int",
                       help="max timespan per request in minutes (default %default)")
 
+    parser.add_option("-B", "--max-bytes", type="int",
+                      help="approximate max bytes per request; if set, the "
+                           "timespan of each channel is derived from its "
+                           "sample rate (--max-timespan is used for channels "
+                           "without sample rate)")
+
+    parser.add_option("-j", "--processes", type="int",
+                      help="number of processes merging data into SDS files; "
+                           "downloaded data is still parsed by the main "
+                           "process; each day file is merged once, after all "
+                           "requests (default %default)")
+
+    parser.add_option("-g", "--fill-gaps", action="store_true", default=False,
+                      help="scan all existing data and download missing "
+                           "intervals instead of continuing after the last record")
+
+    parser.add_option("-A", "--availability", action="store_true", default=False,
+                      help="plan requests from data extents reported by the "
+                           "availability service")
+
+    parser.add_option("-x", "--extents-file", type="string",
+                      help="plan requests from data extents in a file "
+                           "(availability service text format)")
+
     parser.add_option("-z", "--no-citation", action="store_true", default=False,
                       help="suppress network citation info")
 
@@ -325,6 +737,17 @@ def main():
     logs.info = (log_silent, log_verbose)[options.verbose]
     logs.debug = log_silent
 
+    if options.max_bytes is not None and options.max_bytes < MIN_RECLEN:
+        logs.error("invalid max bytes: %d (less than one record)"
+                   % options.max_bytes)
+        return 1
+
+    if options.processes > 1:
+        pool = multiprocessing.Pool(options.processes)
+
+    else:
+        pool = None
+
     try:
         try:
             proc = exec_fetch(param1, None, options.verbose, options.no_check)
@@ -335,6 +758,8 @@ def main():
             return 1
 
         timespan = {}
+        codes = {}
+        now = to_ns(datetime.datetime.utcnow())
 
         for line in proc.stdout:
             if isinstance(line, bytes):
@@ -343,23 +768,31 @@ def main():
             if not line or line.startswith('#'):
                 continue
 
-            starttime = max(dateutil.parser.parse(line.split('|')[15]), times['starttime'])
+            fields = line.rstrip('\r\n').split('|')
 
             try:
-                endtime = min(dateutil.parser.parse(line.split('|')[16]), times['endtime'])
+                samprate = float(fields[14])
 
             except ValueError:
-                # dateutil.parser.parse('') now causes ValueError instead of current time
-                endtime = min(datetime.datetime.now(), times['endtime'])
+                samprate = 0.0
 
-            if starttime.tzinfo is not None:
-                starttime = starttime.astimezone(dateutil.tz.tzutc()).replace(tzinfo=None)
+            starttime = max(parse_time(fields[15]), times['starttime'])
 
-            if endtime.tzinfo is not None:
-                endtime = endtime.astimezone(dateutil.tz.tzutc()).replace(tzinfo=None)
+            try:
+                endtime = min(parse_time(fields[16]), times['endtime'])
+
+            except ValueError:
+                # open epoch
+                endtime = min(now, times['endtime'])
+
+            if starttime >= endtime:
+                continue
+
+            # share the code strings between channels
+            nslc = tuple(codes.setdefault(c, c) for c in fields[:4])
 
             try:
-                ts = timespan[tuple(line.split('|')[:4])]
+                ts = timespan[nslc]
 
                 if ts.start > starttime:
                     ts.start = starttime
@@ -368,8 +801,11 @@ def main():
                 if ts.end < endtime:
                     ts.end = endtime
 
+                if ts.samprate < samprate:
+                    ts.samprate = samprate
+
             except KeyError:
-                timespan[tuple(line.split('|')[:4])] = Timespan(starttime, endtime)
+                timespan[nslc] = Timespan(starttime, endtime, samprate)
 
         proc.stdout.close()
         proc.wait()
@@ -379,21 +815,59 @@ def main():
             return 1
 
         if os.path.exists(options.output_dir):
-            scan_sds(options.output_dir, timespan, nets)
+            if options.fill_gaps:
+                sync_sds(options.output_dir, timespan, nets)
+
+            else:
+                scan_sds(options.output_dir, timespan, nets)
+
+        if options.extents_file:
+            with open(options.extents_file, 'rb') as fd:
+                plan_extents(timespan, read_extents(fd))
+
+        elif options.availability and timespan:
+            logs.info("retrieving data availability")
+
+            try:
+                extents = get_availability(timespan, param3, options.verbose,
+                                           options.no_check)
+
+            except OSError as e:
+                logs.error(str(e))
+                logs.error("error running fdsnws_fetch")
+                return 1
+
+            plan_extents(timespan, extents)
+
+        # records of all requests are spooled and indexed by day file; each
+        # day file is merged once, after the last request
+        spool = tempfile.NamedTemporaryFile()
+        chunks = {}
+        sds_paths = {}
+        failed = False
 
         while len(timespan) > 0:
             postdata = ""
 
-            ts_used = random.sample(timespan.items(), min(len(timespan), options.max_lines))
+            ts_used = random.sample(list(timespan.items()), min(len(timespan), options.max_lines))
 
-            for ((net, sta, loc, cha), ts) in ts_used:
-                te = min(ts.end, ts.start + datetime.timedelta(minutes=options.max_timespan))
+            if options.max_bytes:
+                # share the byte budget of the request between its lines
+                max_bytes = options.max_bytes / len(ts_used)
 
+            else:
+                max_bytes = None
+
+            ts_used = [(nslc, ts, ts.window(options.max_timespan, max_bytes))
+                       for (nslc, ts) in ts_used]
+
+            for ((net, sta, loc, cha), ts, te) in ts_used:
                 if loc == '':
                     loc = '--'
 
                 postdata += "%s %s %s %s %sZ %sZ\n" \
-                            % (net, sta, loc, cha, ts.start.isoformat(), te.isoformat())
+                            % (net, sta, loc, cha, from_ns(ts.start).isoformat(),
+                               from_ns(te).isoformat())
 
             if not isinstance(postdata, bytes):
                 postdata = postdata.encode('utf-8')
@@ -404,37 +878,56 @@ def main():
             except OSError as e:
                 logs.error(str(e))
                 logs.error("error running fdsnws_fetch")
-                return 1
+                failed = True
+                break
 
             got_data = False
 
             try:
-                for rec in mseedlite.Input(proc.stdout):
+                for rec in mseedlite.Input(proc.stdout, resync=True):
+                    nslc = (rec.net, rec.sta, rec.loc, rec.cha)
+
                     try:
-                        ts = timespan[(rec.net, rec.sta, rec.loc, rec.cha)]
+                        ts = timespan[nslc]
 
                     except KeyError:
-                        logs.warning("unexpected data: %s.%s.%s.%s" % (rec.net, rec.sta, rec.loc, rec.cha))
+                        logs.warning("unexpected data: %s.%s.%s.%s" % nslc)
                         continue
 
-                    if rec.end_time <= ts.current:
-                        continue
+                    try:
+                        sds_path = sds_paths[(nslc, rec.begin_ns // DAY_NS)]
+
+                    except KeyError:
+                        day = from_ns(rec.begin_ns // DAY_NS * DAY_NS)
+
+                        sds_dir = "%s/%d/%s/%s/%s.D" \
+                                  % (options.output_dir, day.year, rec.net, rec.sta, rec.cha)
 
-                    sds_dir = "%s/%d/%s/%s/%s.D" \
-                              % (options.output_dir, rec.begin_time.year, rec.net, rec.sta, rec.cha)
+                        sds_file = "%s.%s.%s.%s.D.%s" \
+                                  % (rec.net, rec.sta, rec.loc, rec.cha, day.strftime('%Y.%j'))
 
-                    sds_file = "%s.%s.%s.%s.D.%s" \
-                              % (rec.net, rec.sta, rec.loc, rec.cha, rec.begin_time.strftime('%Y.%j'))
+                        if not os.path.exists(sds_dir):
+                            os.makedirs(sds_dir)
 
-                    if not os.path.exists(sds_dir):
-                        os.makedirs(sds_dir)
+                        sds_path = sds_dir + '/' + sds_file
+                        sds_paths[(nslc, rec.begin_ns // DAY_NS)] = sds_path
+                        nets.add((rec.net, day.year))
 
-                    with open(sds_dir + '/' + sds_file, 'ab') as fd:
-                        fd.write(rec.header + rec.data)
+                    offset = spool.tell()
+                    spool.write(rec.header + rec.data)
+                    day_chunks = chunks.setdefault(sds_path, [])
 
-                    ts.current = rec.end_time
-                    nets.add((rec.net, rec.begin_time.year))
-                    got_data = True
+                    if day_chunks and sum(day_chunks[-1]) == offset:
+                        day_chunks[-1] = (day_chunks[-1][0], day_chunks[-1][1] + rec.size)
+
+                    else:
+                        day_chunks.append((offset, rec.size))
+
+                    end_time = rec.end_ns
+
+                    if end_time > ts.current:
+                        ts.current = end_time
+                        got_data = True
 
             except mseedlite.MSeedError as e:
                 logs.error(str(e))
@@ -444,21 +937,41 @@ def main():
 
             if proc.returncode != 0:
                 logs.error("error running fdsnws_fetch")
-                return 1
+                failed = True
+                break
 
-            for ((net, sta, loc, cha), ts) in ts_used:
+            for ((net, sta, loc, cha), ts, te) in ts_used:
                 if not got_data:
                     # no progress, skip to next segment
-                    ts.start += datetime.timedelta(minutes=options.max_timespan)
+                    ts.start = te
 
                 else:
                     # continue from current position
                     ts.start = ts.current
 
-                if ts.start >= ts.end:
+                if ts.start >= ts.end and not ts.next_interval():
                     # timespan completed
                     del timespan[(net, sta, loc, cha)]
 
+        spool.flush()
+
+        # the streams have been parsed by this process while they were read
+        # from fdsnws_fetch; only merging the day files is done by the pool
+        tasks = [(path, spool.name, day_chunks) for (path, day_chunks) in chunks.items()]
+
+        if pool is not None:
+            for _ in pool.imap_unordered(ingest_day, tasks):
+                pass
+
+        else:
+            for task in tasks:
+                ingest_day(task)
+
+        spool.close()
+
+        if failed:
+            return 1
+
         if nets and not options.no_citation:
             logs.info("retrieving network citation info")
             get_citation(nets, param0, options.verbose)
@@ -467,6 +980,11 @@ def main():
         logs.error(str(e))
         return 1
 
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
     return 0
 
 
@@ -15,6 +15,7 @@ import optparse
 import subprocess
 import tempfile
 import shutil
+import multiprocessing
 import dateutil.parser
 from fdsnwsscripts.seiscomp import fdsnxml, mseedlite, fseed, logs
 
@@ -103,7 +104,21 @@ def get_citation(nets, param, verbose):
 
 
 def iterinv(obj):
-    return (j for i in obj.values() for j in i.values())
+    # sorted by code and start time, so that the abbreviations of a
+    # volume are numbered in the same order each time
+    return (i[k] for (_, i) in sorted(obj.items()) for k in sorted(i))
+
+
+def add_inventory(seed_volume, inv):
+    for net in iterinv(inv.network):
+        for sta in iterinv(net.station):
+            for loc in iterinv(sta.sensorLocation):
+                for cha in iterinv(loc.stream):
+                    try:
+                        seed_volume.add_chan(net.code, sta.code, loc.code, cha.code, cha.start, cha.end)
+
+                    except fseed.SEEDError as e:
+                        logs.warning("%s.%s.%s.%s.%s: %s" % (net.code, sta.code, loc.code, cha.code, cha.start.isoformat(), e))
 
 
 def main():
@@ -142,7 +157,8 @@ def main():
             timeout=600,
             retries=10,
             retry_wait=60,
-            threads=5)
+            threads=5,
+            record_length=4096)
 
     parser.add_option("-v", "--verbose", action="store_true", default=False,
                       help="verbose mode")
@@ -214,6 +230,24 @@ def main():
     parser.add_option("-d", "--dataless", action="store_true", default=False,
                       help="create dataless SEED volume")
 
+    parser.add_option("-D", "--response-dictionary", action="store_true",
+                      default=False,
+                      help="write responses to dictionary blockettes, which "
+                           "are shared by channels with the same response")
+
+    parser.add_option("-i", "--incremental", action="store_true", default=False,
+                      help="convert metadata one network at a time to save "
+                           "memory; abbreviations are numbered in the order "
+                           "of the networks in the StationXML")
+
+    parser.add_option("-j", "--processes", type="int", default=1,
+                      help="number of processes formatting station headers "
+                           "(default %default)")
+
+    parser.add_option("-R", "--record-length", type="int",
+                      help="record length of SEED volume in bytes, 256..65536 "
+                           "(default %default)")
+
     parser.add_option("-l", "--label", type="string",
                       help="label of SEED volume")
 
@@ -259,89 +293,121 @@ def main():
     logs.info = (log_silent, log_verbose)[options.verbose]
     logs.debug = log_silent
 
-    try:
-        proc = exec_fetch(param1, None, options.verbose, options.no_check)
+    rec_len_exp = options.record_length.bit_length() - 1
 
-    except OSError as e:
-        logs.error(str(e))
-        logs.error("error running fdsnws_fetch")
+    if options.record_length != 1 << rec_len_exp or \
+            not 8 <= rec_len_exp <= 16:
+        logs.error("invalid record length: %d" % options.record_length)
         return 1
 
-    inv = fdsnxml.Inventory()
+    if options.processes > 1:
+        pool = multiprocessing.Pool(options.processes)
 
-    with tempfile.TemporaryFile() as fd:
-        shutil.copyfileobj(proc.stdout, fd)
+    else:
+        pool = None
 
-        proc.stdout.close()
-        proc.wait()
+    try:
+        try:
+            proc = exec_fetch(param1, None, options.verbose, options.no_check)
 
-        if proc.returncode != 0:
+        except OSError as e:
+            logs.error(str(e))
             logs.error("error running fdsnws_fetch")
             return 1
 
-        if fd.tell():
-            fd.seek(0)
+        inv = fdsnxml.Inventory()
+        seed_volume = fseed.SEEDVolume(inv, ORGANIZATION, options.label,
+                                       options.response_dictionary,
+                                       rec_len_exp)
 
-            try:
-                inv.load_fdsnxml(fd)
+        with tempfile.TemporaryFile() as inv_fd:
+            shutil.copyfileobj(proc.stdout, inv_fd)
 
-            except fdsnxml.Error as e:
-                logs.error(str(e))
+            proc.stdout.close()
+            proc.wait()
+
+            if proc.returncode != 0:
+                logs.error("error running fdsnws_fetch")
                 return 1
 
-    seed_volume = fseed.SEEDVolume(inv, ORGANIZATION, options.label, False)
+            have_inv = inv_fd.tell() > 0
+            inv_fd.seek(0)
+
+            if have_inv and not options.incremental:
+                try:
+                    inv.load_fdsnxml(inv_fd)
+
+                except fdsnxml.Error as e:
+                    logs.error(str(e))
+                    return 1
 
-    if options.dataless:
-        for net in iterinv(inv.network):
-            for sta in iterinv(net.station):
-                for loc in iterinv(sta.sensorLocation):
-                    for cha in iterinv(loc.stream):
+            if not options.dataless:
+                try:
+                    proc = exec_fetch(param2, None, options.verbose, options.no_check)
+
+                except OSError as e:
+                    logs.error(str(e))
+                    logs.error("error running fdsnws_fetch")
+                    return 1
+
+                try:
+                    for rec in mseedlite.Input(proc.stdout, resync=True):
                         try:
-                            seed_volume.add_chan(net.code, sta.code, loc.code, cha.code, cha.start, cha.end)
+                            seed_volume.add_data(rec)
 
                         except fseed.SEEDError as e:
-                            logs.warning("%s.%s.%s.%s.%s: %s" % (net.code, sta.code, loc.code, cha.code, cha.start.isoformat(), e))
+                            logs.warning("%s.%s.%s.%s.%s: %s" % (rec.net, rec.sta, rec.loc, rec.cha, rec.begin_time.isoformat(), e))
 
-    else:
-        try:
-            proc = exec_fetch(param2, None, options.verbose, options.no_check)
+                        nets.add((rec.net, rec.begin_time.year))
 
-        except OSError as e:
-            logs.error(str(e))
-            logs.error("error running fdsnws_fetch")
-            return 1
+                except mseedlite.MSeedError as e:
+                    logs.error(str(e))
 
-        try:
-            for rec in mseedlite.Input(proc.stdout):
+                proc.stdout.close()
+                proc.wait()
+
+                if proc.returncode != 0:
+                    logs.error("error running fdsnws_fetch")
+                    return 1
+
+            if have_inv and options.incremental:
+                # The waveform data is known at this point, so the station
+                # control headers can be written as soon as a network has been
+                # loaded. Only the abbreviation dictionaries are kept in memory.
                 try:
-                    seed_volume.add_data(rec)
+                    for net_code in inv.iterload_fdsnxml(inv_fd):
+                        if options.dataless:
+                            add_inventory(seed_volume, inv)
 
-                except fseed.SEEDError as e:
-                    logs.warning("%s.%s.%s.%s.%s: %s" % (rec.net.code, rec.sta.code, rec.loc.code, rec.cha.code, rec.cha.start.isoformat(), e))
+                        else:
+                            seed_volume.add_data_chans(net_code)
 
-                nets.add((rec.net, rec.begin_time.year))
+                        seed_volume.spool_stations(pool)
+                        inv.clear()
 
-        except mseedlite.MSeedError as e:
-            logs.error(str(e))
+                except fdsnxml.Error as e:
+                    logs.error(str(e))
+                    return 1
 
-        proc.stdout.close()
-        proc.wait()
+            elif options.dataless:
+                add_inventory(seed_volume, inv)
 
-        if proc.returncode != 0:
-            logs.error("error running fdsnws_fetch")
-            return 1
+        with open(options.output_file, "wb") as fd:
+            try:
+                seed_volume.output(fd, pool=pool)
 
-    with open(options.output_file, "wb") as fd:
-        try:
-            seed_volume.output(fd)
+            except fseed.SEEDError as e:
+                logs.error(str(e))
+                return 1
 
-        except fseed.SEEDError as e:
-            logs.error(str(e))
-            return 1
+        if nets and not options.no_citation:
+            logs.info("retrieving network citation info")
+            get_citation(nets, param0, options.verbose)
 
-    if nets and not options.no_citation:
-        logs.info("retrieving network citation info")
-        get_citation(nets, param0, options.verbose)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     return 0
 
@@ -126,6 +126,12 @@ DATA_ONLY_BLOCKETTE_SIZE = 8
 
 DATA_ONLY_BLOCKETTE_NUMBER = 1000
 MINIMUM_RECORD_LENGTH = 256
+MAXIMUM_RECORD_LENGTH = 65536
+
+# start of a plausible miniSEED data record: sequence number and quality
+# indicator
+RECORD_SYNC_PATTERN = re.compile(b'[0-9 \\x00]{6}[DRQM][ \\x00]')
+RECORD_SYNC_LENGTH = 8
 
 DEFAULT_TOKEN_LOCATION = os.environ.get("HOME", "") + "/.eidatoken"
 
@@ -307,6 +313,56 @@ class XMLCombiner(object):
             self.__et.write(fd)
 
 
+class RecordReader(object):
+    """Reads a miniSEED stream, allowing to skip corrupt data up to the
+    next plausible record header"""
+
+    def __init__(self, fd):
+        self.__fd = fd
+        self.__buf = bytes()
+        self.pos = 0
+
+    def read(self, size):
+        if self.__buf:
+            buf = self.__buf[:size]
+            self.__buf = self.__buf[size:]
+
+            if len(buf) < size:
+                buf += self.__fd.read(size - len(buf))
+
+        else:
+            buf = self.__fd.read(size)
+
+        self.pos += len(buf)
+        return buf
+
+    def resync(self, record):
+        """Skip the partially read record up to the next plausible record
+        header. Returns the offset of the skipped data and the number of
+        bytes skipped; the remaining data is skipped if no header is
+        found."""
+
+        start = self.pos - len(record)
+        buf = record[1:]
+
+        while True:
+            m = RECORD_SYNC_PATTERN.search(buf)
+
+            if m:
+                self.__buf = buf[m.start():] + self.__buf
+                self.pos -= len(buf) - m.start()
+                break
+
+            chunk = self.read(MAXIMUM_RECORD_LENGTH)
+
+            if not chunk:
+                break
+
+            buf = buf[-(RECORD_SYNC_LENGTH - 1):] + chunk
+
+        return (start, self.pos - start)
+
+
 class ArclinkParser(object):
     def __init__(self):
         self.postdata = ""
@@ -684,6 +740,13 @@ def fetch(url, cred, authdata, postlines, xc, tc, dest, nets, chans,
                         if content_type == "application/vnd.fdsn.mseed":
 
                             record_idx = 1
+                            reader = RecordReader(fd)
+
+                            def skip(record, reason):
+                                (offset, skipped) = reader.resync(record)
+                                msg("record %s: %s, skipped %d bytes at "
+                                    "offset %d" % (record_idx, reason,
+                                                   skipped, offset))
 
                             # NOTE: cannot use fixed chunk size, because
                             # response from single node mixes mseed record
@@ -694,7 +757,7 @@ def fetch(url, cred, authdata, postlines, xc, tc, dest, nets, chans,
                             while True:
 
                                 # read fixed header
-                                buf = fd.read(FIXED_DATA_HEADER_SIZE)
+                                buf = reader.read(FIXED_DATA_HEADER_SIZE)
                                 if not buf:
                                     break
 
@@ -725,12 +788,12 @@ def fetch(url, cred, authdata, postlines, xc, tc, dest, nets, chans,
                                 else:
                                     # Full header size cannot be smaller than
                                     # fixed header size. This is an error.
-                                    msg("record %s: data offset smaller than "\
-                                        "fixed header length: %s, bailing "\
-                                        "out" % (record_idx, data_offset))
-                                    break
+                                    skip(record, "data offset smaller "
+                                         "than fixed header length: %s"
+                                         % data_offset)
+                                    continue
 
-                                buf = fd.read(remaining_header_size)
+                                buf = reader.read(remaining_header_size)
                                 if not buf:
                                     msg("remaining header corrupt in record "\
                                         "%s" % record_idx)
@@ -743,7 +806,7 @@ def fetch(url, cred, authdata, postlines, xc, tc, dest, nets, chans,
                                 blockette_start = 0
                                 b1000_found = False
 
-                                while (blockette_start < remaining_header_size):
+                                while (blockette_start + 4 <= len(buf)):
 
                                     # 2 bytes, unsigned short
                                     blockette_id, = struct.unpack(
@@ -757,7 +820,9 @@ def fetch(url, cred, authdata, postlines, xc, tc, dest, nets, chans,
                                         buf[blockette_start+2:blockette_start+4])
 
                                     if blockette_id == \
-                                        DATA_ONLY_BLOCKETTE_NUMBER:
+                                        DATA_ONLY_BLOCKETTE_NUMBER and \
+                                        blockette_start + \
+                                        DATA_ONLY_BLOCKETTE_SIZE <= len(buf):
 
                                         b1000_found = True
                                         break
@@ -770,14 +835,24 @@ def fetch(url, cred, authdata, postlines, xc, tc, dest, nets, chans,
                                             blockette_start))
                                         break
 
+                                    elif next_blockette_start - \
+                                            FIXED_DATA_HEADER_SIZE <= \
+                                            blockette_start:
+                                        # corrupt blockette chain
+                                        break
+
                                     else:
-                                        blockette_start = next_blockette_start
+                                        # pointers are relative to the
+                                        # start of the record, buf starts
+                                        # after the fixed header
+                                        blockette_start = \
+                                            next_blockette_start - \
+                                            FIXED_DATA_HEADER_SIZE
 
                                 # blockette 1000 not found
                                 if not b1000_found:
-                                    msg("record %s: blockette 1000 not found,"\
-                                        " stop reading" % record_idx)
-                                    break
+                                    skip(record, "blockette 1000 not found")
+                                    continue
 
                                 # get record size (1 byte, unsigned char)
                                 record_size_exponent_idx = blockette_start + 6
@@ -789,8 +864,15 @@ def fetch(url, cred, authdata, postlines, xc, tc, dest, nets, chans,
                                 remaining_record_size = \
                                     2**record_size_exponent - curr_size
 
+                                if remaining_record_size < 0 or \
+                                        2**record_size_exponent > \
+                                        MAXIMUM_RECORD_LENGTH:
+                                    skip(record, "invalid record size "
+                                         "exponent: %s" % record_size_exponent)
+                                    continue
+
                                 # read remainder of record (data section)
-                                buf = fd.read(remaining_record_size)
+                                buf = reader.read(remaining_record_size)
                                 if not buf:
                                     msg("cannot read data section of record "\
                                         "%s" % record_idx)
@@ -806,8 +888,8 @@ def fetch(url, cred, authdata, postlines, xc, tc, dest, nets, chans,
                                     cha = record[15:18].decode('ascii').rstrip()
 
                                 except UnicodeDecodeError:
-                                    msg("invalid miniseed record")
-                                    break
+                                    skip(record, "invalid miniseed record")
+                                    continue
 
                                 year, = struct.unpack(b'!H', record[20:22])
 
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###########################################################################
+# (C) 2018 Helmholtz-Zentrum Potsdam - Deutsches GeoForschungsZentrum GFZ #
+#                                                                         #
+# License: LGPLv3 (https://www.gnu.org/copyleft/lesser.html)              #
+###########################################################################
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import sys
+import os
+import stat
+import optparse
+from fdsnwsscripts.seiscomp import mseedlite, logs
+
+VERSION = "2018.011"
+
+
+def read_records(files):
+    for f in files:
+        if f == '-':
+            fd = getattr(sys.stdin, 'buffer', sys.stdin)
+
+        else:
+            fd = open(f, 'rb')
+
+        try:
+            mapped = stat.S_ISREG(os.fstat(fd.fileno()).st_mode)
+
+            for rec in mseedlite.Input(fd, mapped, resync=True):
+                yield rec
+
+        finally:
+            if f != '-':
+                fd.close()
+
+
+def write_records(records, fd, rec_len_exp):
+    nrec = 0
+
+    for (rec, merged) in records:
+        if merged:
+            rec.write(fd, rec_len_exp)
+
+        else:
+            # records that could not be merged (including miniSEED 3
+            # records) are passed through with their own length
+            fd.write(rec.header)
+            fd.write(rec.data)
+
+        nrec += 1
+
+    return nrec
+
+
+def main():
+    parser = optparse.OptionParser(
+            usage="Usage: %prog [-h|--help] [OPTIONS] file...",
+            version="%prog " + VERSION)
+
+    parser.set_defaults(
+            output_file="-",
+            record_length=4096)
+
+    parser.add_option("-v", "--verbose", action="store_true", default=False,
+                      help="verbose mode")
+
+    parser.add_option("-o", "--output-file", type="string",
+                      help="file where re-blocked data is written "
+                           "(default stdout)")
+
+    parser.add_option("-r", "--record-length", type="int",
+                      help="record length of output data in bytes, 256..65536 "
+                           "(default %default)")
+
+    (options, args) = parser.parse_args()
+
+    if not args:
+        parser.print_usage(sys.stderr)
+        return 1
+
+    def log_alert(s):
+        if sys.stderr.isatty():
+            s = "\033[31m" + s + "\033[m"
+
+        sys.stderr.write(s + '\n')
+        sys.stderr.flush()
+
+    def log_notice(s):
+        if sys.stderr.isatty():
+            s = "\033[32m" + s + "\033[m"
+
+        sys.stderr.write(s + '\n')
+        sys.stderr.flush()
+
+    def log_verbose(s):
+        sys.stderr.write(s + '\n')
+        sys.stderr.flush()
+
+    def log_silent(s):
+        pass
+
+    logs.error = log_alert
+    logs.warning = log_alert
+    logs.notice = log_notice
+    logs.info = (log_silent, log_verbose)[options.verbose]
+    logs.debug = log_silent
+
+    rec_len_exp = options.record_length.bit_length() - 1
+
+    if options.record_length != 1 << rec_len_exp or \
+            not 8 <= rec_len_exp <= 16:
+        logs.error("invalid record length: %d" % options.record_length)
+        return 1
+
+    if options.output_file == '-':
+        fd = getattr(sys.stdout, 'buffer', sys.stdout)
+
+    else:
+        fd = open(options.output_file, 'wb')
+
+    try:
+        records = mseedlite.reblock(read_records(args), rec_len_exp)
+        nrec = write_records(records, fd, rec_len_exp)
+
+    except (IOError, mseedlite.MSeedError) as e:
+        logs.error(str(e))
+        return 1
+
+    finally:
+        if options.output_file != '-':
+            fd.close()
+
+    logs.info("%d records written" % nrec)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
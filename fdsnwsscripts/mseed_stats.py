@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+###########################################################################
+# (C) 2018 Helmholtz-Zentrum Potsdam - Deutsches GeoForschungsZentrum GFZ #
+#                                                                         #
+# License: LGPLv3 (https://www.gnu.org/copyleft/lesser.html)              #
+###########################################################################
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import sys
+import os
+import mmap
+import csv
+import json
+import datetime
+import optparse
+import multiprocessing
+from fdsnwsscripts.seiscomp import mseedlite, logs
+
+VERSION = "2018.011"
+
+NS = 1000000000
+
+# length assumed for non-data records before the first data record
+DEFAULT_RECLEN = 4096
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def format_time(t):
+    t = _EPOCH + datetime.timedelta(microseconds=t // 1000)
+    return t.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def list_files(paths):
+    """Expand directories (eg., SDS archives) into the files they contain"""
+    for p in paths:
+        if os.path.isdir(p):
+            for (d, dirs, files) in os.walk(p):
+                dirs.sort()
+
+                for f in sorted(files):
+                    yield os.path.join(d, f)
+
+        else:
+            yield p
+
+
+def split_file(path, chunk_size):
+    """Split a file into byte ranges of about chunk_size bytes that start
+    on record boundaries"""
+
+    size = os.path.getsize(path)
+
+    if size <= chunk_size:
+        return [(path, 0, size)] if size > 0 else []
+
+    with open(path, 'rb') as fd:
+        buf = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+    bounds = [0]
+
+    for offset in range(chunk_size, size, chunk_size):
+        if offset > bounds[-1]:
+            offset = mseedlite.find_record(buf, offset)
+
+            if offset >= size:
+                break
+
+            bounds.append(offset)
+
+    bounds.append(size)
+    return [(path, bounds[i], bounds[i+1]) for i in range(len(bounds) - 1)]
+
+
+class ChannelStats(object):
+    def __init__(self, samprate):
+        self.samprate = samprate
+        self.records = 0
+        self.samples = 0
+        self.bytes = 0
+        self.spans = []
+
+    def add(self, rec):
+        self.records += 1
+        self.samples += rec.nsamp
+        self.bytes += rec.size
+
+        # consecutive records are joined already here to keep the span
+        # lists short
+        if self.spans and self.spans[-1][1] == rec.begin_ns:
+            self.spans[-1] = (self.spans[-1][0], rec.end_ns)
+
+        else:
+            self.spans.append((rec.begin_ns, rec.end_ns))
+
+    def update(self, other):
+        self.records += other.records
+        self.samples += other.samples
+        self.bytes += other.bytes
+        self.spans += other.spans
+
+    def get_extents(self):
+        """Return the data extents and the gaps and overlaps between them;
+        differences up to half a sample are tolerated"""
+
+        if self.samprate > 0:
+            tolerance = int(NS / self.samprate / 2)
+
+        else:
+            tolerance = 0
+
+        extents = []
+        gaps = []
+        overlaps = []
+
+        for (start, end) in sorted(self.spans):
+            if extents:
+                (cur_start, cur_end) = extents[-1]
+
+                if start > cur_end + tolerance:
+                    gaps.append((cur_end, start))
+                    extents.append((start, end))
+                    continue
+
+                if start < cur_end - tolerance:
+                    # adjacent overlaps are joined, so that the result
+                    # does not depend on how the spans have been split
+                    # (eg., between chunks)
+                    if overlaps and start <= overlaps[-1][1] + tolerance:
+                        overlaps[-1] = (overlaps[-1][0],
+                                        max(overlaps[-1][1], min(end, cur_end)))
+
+                    else:
+                        overlaps.append((start, min(end, cur_end)))
+
+                extents[-1] = (cur_start, max(end, cur_end))
+
+            else:
+                extents.append((start, end))
+
+        return (extents, gaps, overlaps)
+
+
+def scan_range(task):
+    (path, start, end) = task
+    stats = {}
+
+    with open(path, 'rb') as fd:
+        buf = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+    offset = start
+    reclen = None
+
+    while offset < end:
+        try:
+            rec = mseedlite.Record(buf, offset)
+
+        except StopIteration:
+            break
+
+        except mseedlite.MSeedNoData:
+            # non-data records (eg., SEED control headers) are assumed to
+            # have the length of the last data record, like in Input
+            offset += reclen or DEFAULT_RECLEN
+            continue
+
+        except mseedlite.MSeedError as e:
+            next_offset = mseedlite.find_record(buf, offset + 1)
+            logs.warning("%s: skipped %d bytes at offset %d: %s"
+                         % (path, next_offset - offset, offset, str(e)))
+
+            offset = next_offset
+            continue
+
+        nslc = (rec.net, rec.sta, rec.loc, rec.cha)
+
+        try:
+            cs = stats[(nslc, rec.fsamp)]
+
+        except KeyError:
+            cs = stats[(nslc, rec.fsamp)] = ChannelStats(rec.fsamp)
+
+        cs.add(rec)
+        offset += rec.size
+
+        if rec.version == 2:
+            reclen = rec.size
+
+    return stats
+
+
+def write_json(fd, stats):
+    result = []
+
+    for ((nslc, samprate), cs) in sorted(stats.items()):
+        (extents, gaps, overlaps) = cs.get_extents()
+        result.append({
+            "network": nslc[0],
+            "station": nslc[1],
+            "location": nslc[2],
+            "channel": nslc[3],
+            "samplerate": samprate,
+            "earliest": format_time(extents[0][0]),
+            "latest": format_time(extents[-1][1]),
+            "records": cs.records,
+            "samples": cs.samples,
+            "bytes": cs.bytes,
+            "gaps": [[format_time(s), format_time(e)] for (s, e) in gaps],
+            "overlaps": [[format_time(s), format_time(e)] for (s, e) in overlaps]
+        })
+
+    fd.write(json.dumps(result, indent=2) + '\n')
+
+
+def write_csv(fd, stats):
+    w = csv.writer(fd, lineterminator='\n')
+    w.writerow(["network", "station", "location", "channel", "samplerate",
+                "earliest", "latest", "records", "samples", "bytes", "gaps",
+                "overlaps"])
+
+    for ((nslc, samprate), cs) in sorted(stats.items()):
+        (extents, gaps, overlaps) = cs.get_extents()
+        w.writerow(list(nslc) + [samprate, format_time(extents[0][0]),
+                                 format_time(extents[-1][1]), cs.records,
+                                 cs.samples, cs.bytes, len(gaps),
+                                 len(overlaps)])
+
+
+def main():
+    parser = optparse.OptionParser(
+            usage="Usage: %prog [-h|--help] [OPTIONS] file|directory...",
+            version="%prog " + VERSION)
+
+    parser.set_defaults(
+            format="json",
+            processes=multiprocessing.cpu_count(),
+            chunk_size=64)
+
+    parser.add_option("-v", "--verbose", action="store_true", default=False,
+                      help="verbose mode")
+
+    parser.add_option("-f", "--format", type="choice",
+                      choices=["json", "csv"],
+                      help="output format, json or csv (default %default)")
+
+    parser.add_option("-o", "--output-file", type="string",
+                      help="file where the summary is written (default stdout)")
+
+    parser.add_option("-j", "--processes", type="int",
+                      help="number of scanning processes (default %default)")
+
+    parser.add_option("-b", "--chunk-size", type="int",
+                      help="size of file chunks scanned by one process in "
+                           "MiB (default %default)")
+
+    (options, args) = parser.parse_args()
+
+    if not args:
+        parser.print_usage(sys.stderr)
+        return 1
+
+    def log_alert(s):
+        if sys.stderr.isatty():
+            s = "\033[31m" + s + "\033[m"
+
+        sys.stderr.write(s + '\n')
+        sys.stderr.flush()
+
+    def log_notice(s):
+        if sys.stderr.isatty():
+            s = "\033[32m" + s + "\033[m"
+
+        sys.stderr.write(s + '\n')
+        sys.stderr.flush()
+
+    def log_verbose(s):
+        sys.stderr.write(s + '\n')
+        sys.stderr.flush()
+
+    def log_silent(s):
+        pass
+
+    logs.error = log_alert
+    logs.warning = log_alert
+    logs.notice = log_notice
+    logs.info = (log_silent, log_verbose)[options.verbose]
+    logs.debug = log_silent
+
+    if options.chunk_size < 1:
+        logs.error("invalid chunk size: %d" % options.chunk_size)
+        return 1
+
+    tasks = []
+
+    for path in list_files(args):
+        try:
+            tasks += split_file(path, options.chunk_size * 1024 * 1024)
+
+        except (IOError, OSError, ValueError) as e:
+            logs.error("%s: %s" % (path, str(e)))
+
+    logs.info("scanning %d chunks" % len(tasks))
+
+    stats = {}
+
+    def collect(results):
+        for result in results:
+            for (key, cs) in result.items():
+                try:
+                    stats[key].update(cs)
+
+                except KeyError:
+                    stats[key] = cs
+
+    if options.processes > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(options.processes)
+
+        try:
+            collect(pool.imap_unordered(scan_range, tasks))
+
+        finally:
+            pool.close()
+            pool.join()
+
+    else:
+        collect(scan_range(task) for task in tasks)
+
+    if options.output_file:
+        fd = open(options.output_file, 'w')
+
+    else:
+        fd = sys.stdout
+
+    try:
+        if options.format == "csv":
+            write_csv(fd, stats)
+
+        else:
+            write_json(fd, stats)
+
+    finally:
+        if fd is not sys.stdout:
+            fd.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
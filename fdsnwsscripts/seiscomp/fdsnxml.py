@@ -800,20 +800,64 @@ class Inventory(fdsnwsscripts.seiscomp.db.generic.inventory.Inventory):
 
 
     def load_fdsnxml(self, src):
-        try:
-            tree = ET.parse(src).getroot()
+        for net_code in self.iterload_fdsnxml(src):
+            pass
 
-        except Exception as ex:
-            raise Error(ex)
 
-        for e in tree:
+    def iterload_fdsnxml(self, src):
+        """Load FDSNXML one network at a time. The code of each network is
+        yielded after the network has been added, so the caller can process
+        and clear() the inventory before the next network is parsed."""
+
+        depth = 0
+        root = None
+        events = None
+
+        while True:
+            # all errors of the parser are reported as Error
+            try:
+                if events is None:
+                    events = ET.iterparse(src, events=("start", "end"))
+
+                (event, e) = next(events)
+
+            except StopIteration:
+                break
+
+            except Exception as ex:
+                raise Error(ex)
+
+            if event == "start":
+                if root is None:
+                    root = e
+
+                depth += 1
+                continue
+
+            depth -= 1
+
+            if depth != 1:
+                continue
+
             if e.tag == ns + "Source":
                 self.__archive = e.text
 
             elif e.tag == ns + "Network":
                 if 'startDate' not in e.attrib:
                     logs.error("error: network %s is missing startDate" % e.attrib['code'])
-                    continue
 
-                self.__process_network(e)
+                else:
+                    self.__process_network(e)
+                    yield e.attrib['code']
+
+            # drop the elements that have been processed
+            root.clear()
+
+
+    def clear(self):
+        """Remove all networks and instruments"""
+
+        self.object = {}
+        self.clear_instruments()
+        self.clear_stations()
 
@@ -11,74 +11,66 @@
 # version. For more information, see http://www.gnu.org/
 #*****************************************************************************
 
+import io
 import re
 import json
+import bisect
 import datetime
-import fdsnwsscripts.seiscomp.mseedlite as mseed
 from tempfile import TemporaryFile
 from shutil import copyfileobj
 from fdsnwsscripts.seiscomp import logs
 
+# default record length of a volume, 4096 bytes
 _RECLEN_EXP = 12
 
+# number of records read or written at a time
+_IO_RECORDS = 256
+
 def _min_data_gap(fsamp):
     return datetime.timedelta(microseconds=1000000/(fsamp * 10))
 
 #_min_ts_gap = datetime.timedelta(minutes=1)
 _min_ts_gap = datetime.timedelta(days=3650)
 
+# a time series that starts or ends more than this from the data of all
+# channels starts a new volume time span (blockettes 12 and 70)
+_min_span_gap = datetime.timedelta(minutes=1)
+
 class SEEDError(Exception):
     pass
 
-_rx_coeff = re.compile(r'\s*(\S+)\s*')
+_rx_coeff = re.compile(r'\S+')
 
-def _mkseedcoeff(nblk, nfld, ncoeff, s):
-    pos = 0
-    n = 0
-    c = ""
-    
-    while pos < len(s):
-        m = _rx_coeff.match(s, pos)
-        if m == None:
-            raise SEEDError, "blockette %d, field %d: error parsing FIR coefficients at '%s'" % (nblk, nfld, s[pos:])
+def _parse_coeff(nblk, nfld, ncoeff, s, kind):
+    values = s.split()
 
-        try:
-            v = float(m.group(1))
-        except ValueError:
-            raise SEEDError, "blockette %d, field %d: error parsing FIR coefficients at '%s'" % (nblk, nfld, s[pos:])
+    try:
+        values = map(float, values)
 
-        c += "%14.7E" % (v,)
-        n += 1
-        pos = m.end()
-    
-    if n != ncoeff:
-        raise SEEDError, "blockette %d, field %d: expected %d coefficients, found %d" % (nblk, nfld, ncoeff, n)
+    except ValueError:
+        for m in _rx_coeff.finditer(s):
+            try:
+                float(m.group())
+            except ValueError:
+                raise SEEDError, "blockette %d, field %d: error parsing %s coefficients at '%s'" % (nblk, nfld, kind, s[m.start():])
 
-    return c
+    if len(values) != ncoeff:
+        raise SEEDError, "blockette %d, field %d: expected %d coefficients, found %d" % (nblk, nfld, ncoeff, len(values))
 
-def _mkseedcoeff2(nblk, nfld, ncoeff, s, gain=1.0):
-    pos = 0
-    n = 0
-    c = ""
-    
-    while pos < len(s):
-        m = _rx_coeff.match(s, pos)
-        if m == None:
-            raise SEEDError, "blockette %d, field %d: error parsing polynomial coefficients at '%s'" % (nblk, nfld, s[pos:])
+    return values
 
-        try:
-            v = float(m.group(1))
-        except ValueError:
-            raise SEEDError, "blockette %d, field %d: error parsing polynomial coefficients at '%s'" % (nblk, nfld, s[pos:])
+def _mkseedcoeff(nblk, nfld, ncoeff, s):
+    values = _parse_coeff(nblk, nfld, ncoeff, s, "FIR")
+    return ("%14.7E" * len(values)) % tuple(values)
 
-        c += "%12.5E%12.5E" % (v/(gain**n),0)
-        n += 1
-        pos = m.end()
-    
-    if n != ncoeff:
-        raise SEEDError, "blockette %d, field %d: expected %d coefficients, found %d" % (nblk, nfld, ncoeff, n)
+def _mkseedcoeff2(nblk, nfld, ncoeff, s, gain=1.0):
+    values = _parse_coeff(nblk, nfld, ncoeff, s, "polynomial")
+    c = []
+    for (n, v) in enumerate(values):
+        c.append(v/(gain**n))
+        c.append(0)
 
-    return c
+    return ("%12.5E%12.5E" * len(values)) % tuple(c)
 
 _rx_paz = re.compile(r'\s*([0-9]*)\(\s*([^,]+),\s*([^)]+)\)\s*')
 
@@ -156,7 +148,15 @@ def _mkseedfap(nblk, nfld, nfap, s):
 
     return (c,n)
 
-def _mkseedstring(nblk, nfld, s, min_length, max_length, flags):
+_seedstring_formats = {}
+
+def _get_seedstring_format(flags):
+    try:
+        return _seedstring_formats[flags]
+
+    except KeyError:
+        pass
+
     U = L = N = P = S = X = False
     rx_list = []
     
@@ -183,7 +183,15 @@ def _mkseedstring(nblk, nfld, s, min_length, max_length, flags):
     if flags.find("_") != -1:
         X = True
         rx_list.append("_")
-        
+
+    rx = "|".join(rx_list)
+    fmt = (U, L, S, X, re.compile(rx), re.compile("(" + rx + ")*$"))
+    _seedstring_formats[flags] = fmt
+    return fmt
+
+def _mkseedstring(nblk, nfld, s, min_length, max_length, flags):
+    (U, L, S, X, rx_char, rx_valid) = _get_seedstring_format(flags)
+
     sn = s.strip()[:max_length]
 
     if U and not L:
@@ -196,10 +204,9 @@ def _mkseedstring(nblk, nfld, s, min_length, max_length, flags):
     elif X and not S:
         sn = sn.replace(" ", "_")
 
-    rx = "|".join(rx_list)
-    sn = "".join(re.findall(rx, sn))
+    sn = "".join(rx_char.findall(sn))
 
-    if re.match("(" + rx + ")*$", sn) == None:
+    if rx_valid.match(sn) == None:
         raise SEEDError, "blockette %d, field %d: cannot convert string \"%s\" with flags %s" % \
           (nblk, nfld, s, flags)
 
@@ -239,6 +246,24 @@ def _cmptime(t1, t2):
 
     return 0
 
+# attributes that define a response stage; names cannot be used to
+# identify stages, because they are unique for every channel when the
+# inventory is read from FDSNXML
+_response_attrs = ("type", "symmetry", "frequencyUnit", "approximationType",
+    "approximationLowerBound", "approximationUpperBound", "approximationError",
+    "normalizationFactor", "normalizationFrequency", "numberOfZeros", "zeros",
+    "numberOfPoles", "poles", "numberOfCoefficients", "coefficients",
+    "numberOfTuples", "tuples", "gain", "gainFrequency", "decimationFactor",
+    "delay", "correction")
+
+# the gain of a sensor is written to a blockette 48 of its own, so
+# sensors that only differ in gain can share blockettes 42, 43 and 45
+_sensor_attrs = tuple([ a for a in _response_attrs
+    if a not in ("gain", "gainFrequency") ])
+
+def _response_key(obj, attrs=_response_attrs):
+    return tuple([ getattr(obj, a, None) for a in attrs ])
+
 def _is_fir_response(obj):
     return hasattr(obj, "symmetry")
 
@@ -1220,6 +1245,10 @@ class _CommentDict(object):
             b.output(f)
             
 class _GenericAbbreviationDict(object):
+    # Abbreviations are numbered in the order they are looked up. When the
+    # stations are spooled one network at a time, that is the order of the
+    # networks in the inventory file rather than the order in which the
+    # channels are added.
     def __init__(self, inventory):
         self.__inventory = inventory
         self.__num = 0
@@ -1276,6 +1305,12 @@ class _ResponseContainer(object):
     def __init__(self, fac):
         self.__fac = fac
 
+    def __getstate__(self):
+        # the stages have been looked up already (see _Station)
+        state = self.__dict__.copy()
+        del state["_ResponseContainer__fac"]
+        return state
+
     def add_sensor(self, name, dev_id, compn):
         (x1, x2, sens, sens_freq) = self.__fac._lookup_sensor(name,
             dev_id, compn)
@@ -1381,24 +1416,28 @@ class _Response4xFactory(object):
         if resp is None:
             raise SEEDError, "cannot find response for sensor " + sensor.name
         
-        k1 = self.__used_sensor.get(name)
-        if k1 is None:
-            unit = None
-            try:
-                unit = sensor.unit
-            
-            except AttributeError:
-                pass
+        unit = None
+        try:
+            unit = sensor.unit
+        
+        except AttributeError:
+            pass
 
-            if unit:
-                input_units = self.__unit_dict.lookup(unit, sensor.remark)
+        if unit:
+            input_units = self.__unit_dict.lookup(unit, sensor.remark)
 
-            elif _is_paz_response(resp) and resp.numberOfZeros == 0:
-                input_units = self.__unit_dict.lookup("M/S**2")
+        elif _is_paz_response(resp) and resp.numberOfZeros == 0:
+            input_units = self.__unit_dict.lookup("M/S**2")
 
-            else:
-                input_units = self.__unit_dict.lookup("M/S")
-            
+        else:
+            input_units = self.__unit_dict.lookup("M/S")
+
+        resp_key = (_response_key(resp, _sensor_attrs), input_units,
+            getattr(sensor, "lowFrequency", None),
+            getattr(sensor, "highFrequency", None))
+
+        k1 = self.__used_sensor.get(resp_key)
+        if k1 is None:
             k1 = self.__num + 1
 
             if _is_paz_response(resp):
@@ -1447,7 +1486,7 @@ class _Response4xFactory(object):
                 self.__blk45.append(b1)
 
             self.__num += 1
-            self.__used_sensor[name] = k1
+            self.__used_sensor[resp_key] = k1
 
         try:
             calib = sensor.calibration[dev_id][compn]
@@ -1470,7 +1509,7 @@ class _Response4xFactory(object):
         if gain == 0.0 or gain is None or resp.gainFrequency is None:
             return (k1, None, 1.0, 0.0)
         
-        k2 = self.__used_sensor_calib.get((name, dev_id, compn))
+        k2 = self.__used_sensor_calib.get((gain, resp.gainFrequency))
         if k2 is not None:
             return (k1, k2, gain, resp.gainFrequency)
         
@@ -1484,7 +1523,7 @@ class _Response4xFactory(object):
 
         self.__blk48.append(b2)
         self.__num += 1
-        self.__used_sensor_calib[(name, dev_id, compn)] = k2
+        self.__used_sensor_calib[(gain, resp.gainFrequency)] = k2
         return (k1, k2, gain, resp.gainFrequency)
 
     def _lookup_analogue_paz(self, name):
@@ -1492,7 +1531,8 @@ class _Response4xFactory(object):
         if resp_paz is None:
             raise SEEDError, "unknown PAZ response: " + name
 
-        k = self.__used_analogue_paz.get(name)
+        resp_key = _response_key(resp_paz)
+        k = self.__used_analogue_paz.get(resp_key)
         if k is not None:
             (k1, k2) = k
             return (k1, k2, resp_paz.gain)
@@ -1526,7 +1566,7 @@ class _Response4xFactory(object):
         self.__blk43.append(b1)
         self.__blk48.append(b2)
         self.__num += 2
-        self.__used_analogue_paz[name] = (k1, k2)
+        self.__used_analogue_paz[resp_key] = (k1, k2)
         return (k1, k2, resp_paz.gain)
 
     def _lookup_analogue_fap(self, name):
@@ -1534,7 +1574,8 @@ class _Response4xFactory(object):
         if resp_fap is None:
             raise SEEDError, "unknown FAP response: " + name
 
-        k = self.__used_analogue_fap.get(name)
+        resp_key = _response_key(resp_fap)
+        k = self.__used_analogue_fap.get(resp_key)
         if k is not None:
             (k1, k2) = k
             return (k1, k2, resp_fap.gain)
@@ -1557,7 +1598,7 @@ class _Response4xFactory(object):
         self.__blk45.append(b1)
         self.__blk48.append(b2)
         self.__num += 2
-        self.__used_analogue_fap[name] = (k1, k2)
+        self.__used_analogue_fap[resp_key] = (k1, k2)
         return (k1, k2, resp_fap.gain)
 
     def _lookup_digitizer(self, name, dev_id, compn, sample_rate, sample_rate_div):
@@ -1586,7 +1627,7 @@ class _Response4xFactory(object):
         except KeyError:
             pass
 
-        k = self.__used_digitizer.get((name, input_rate))
+        k = self.__used_digitizer.get(input_rate)
         if k is None:
             k1 = self.__num + 1
             k2 = self.__num + 2
@@ -1608,7 +1649,7 @@ class _Response4xFactory(object):
             self.__blk44.append(b1)
             self.__blk47.append(b2)
             self.__num += 2
-            self.__used_digitizer[(name, input_rate)] = (k1, k2)
+            self.__used_digitizer[input_rate] = (k1, k2)
         else:
             (k1, k2) = k
 
@@ -1630,7 +1671,7 @@ class _Response4xFactory(object):
             dev_id = None
             compn = None
         
-        k3 = self.__used_digitizer_calib.get((name, dev_id, compn))
+        k3 = self.__used_digitizer_calib.get(gain)
         if k3 is not None:
             return (k1, k2, k3, input_rate, gain)
 
@@ -1644,7 +1685,7 @@ class _Response4xFactory(object):
         
         self.__blk48.append(b3)
         self.__num += 1
-        self.__used_digitizer_calib[(name, dev_id, compn)] = k3
+        self.__used_digitizer_calib[gain] = k3
         return (k1, k2, k3, input_rate, gain)
 
     def _lookup_digital_paz(self, name, input_rate):
@@ -1652,7 +1693,8 @@ class _Response4xFactory(object):
         if resp_paz is None:
             raise SEEDError, "unknown PAZ response: " + name
 
-        k = self.__used_digital_paz.get(name)
+        resp_key = (_response_key(resp_paz), input_rate)
+        k = self.__used_digital_paz.get(resp_key)
         if k is not None:
             (k1, k2, k3) = k
             return (k1, k2, k3, resp_paz.gain)
@@ -1706,7 +1748,7 @@ class _Response4xFactory(object):
         self.__blk47.append(b2)
         self.__blk48.append(b3)
         self.__num += 3
-        self.__used_digital_paz[name] = (k1, k2, k3)
+        self.__used_digital_paz[resp_key] = (k1, k2, k3)
         return (k1, k2, k3, resp_paz.gain)
 
     def _lookup_fir(self, name, input_rate):
@@ -1714,7 +1756,8 @@ class _Response4xFactory(object):
         if resp_fir is None:
             raise SEEDError, "unknown FIR response: " + name
 
-        k = self.__used_fir.get(name)
+        resp_key = _response_key(resp_fir)
+        k = self.__used_fir.get(resp_key)
         if k is None:
             k1 = self.__num + 1
             k3 = self.__num + 2
@@ -1735,11 +1778,11 @@ class _Response4xFactory(object):
             self.__blk41.append(b1)
             self.__blk48.append(b3)
             self.__num += 2
-            self.__used_fir[name] = (k1, k3)
+            self.__used_fir[resp_key] = (k1, k3)
         else:
             (k1, k3) = k
 
-        k2 = self.__used_fir_deci.get((name, input_rate))
+        k2 = self.__used_fir_deci.get((resp_key, input_rate))
         if k2 is None:
             k2 = self.__num + 1
             b2 = _Blockette47(key = k2,
@@ -1752,7 +1795,7 @@ class _Response4xFactory(object):
 
             self.__blk47.append(b2)
             self.__num += 1
-            self.__used_fir_deci[(name, input_rate)] = k2
+            self.__used_fir_deci[(resp_key, input_rate)] = k2
 
         return (k1, k2, k3, input_rate / resp_fir.decimationFactor, resp_fir.gain)
 
@@ -2032,7 +2075,7 @@ class _Response5xFactory(object):
             
 class _Channel(object):
     def __init__(self, inventory, strmcfg, format_dict, unit_dict,
-        gen_dict, resp_container):
+        gen_dict, resp_container, rec_len_exp):
 
         loccfg = strmcfg.mySensorLocation
         statcfg = loccfg.myStation
@@ -2106,7 +2149,7 @@ class _Channel(object):
             azimuth = strmcfg.azimuth,
             dip = strmcfg.dip,
             data_format = format_dict.lookup(strmcfg.format),
-            record_length = 12,
+            record_length = rec_len_exp,
             sample_rate = sample_rate,
             clock_drift = clock_drift,
             flags = strmcfg.flags,
@@ -2196,7 +2239,7 @@ class _Channel(object):
             
 class _Station(object):
     def __init__(self, inventory, statcfg, format_dict, unit_dict,
-        comment_dict, gen_dict, resp_fac):
+        comment_dict, gen_dict, resp_fac, rec_len_exp):
         self.__inventory = inventory
         self.__statcfg = statcfg
         self.__format_dict = format_dict
@@ -2204,6 +2247,7 @@ class _Station(object):
         self.__comment_dict = comment_dict
         self.__gen_dict = gen_dict
         self.__resp_fac = resp_fac
+        self.__rec_len_exp = rec_len_exp
         self.__recno = 0
         self.__id = (statcfg.myNetwork.code, statcfg.myNetwork.start,
           statcfg.code, statcfg.start)
@@ -2236,6 +2280,16 @@ class _Station(object):
             return 1
 
         return 0
+
+    def __getstate__(self):
+        # a station sent to a worker process of spool_stations() is only
+        # formatted, so the inventory and dictionaries are left behind
+        state = self.__dict__.copy()
+        for k in ("inventory", "statcfg", "format_dict", "unit_dict",
+            "comment_dict", "gen_dict", "resp_fac"):
+            del state["_Station__" + k]
+
+        return state
     
     def add_chan(self, strmcfg):
         loccfg = strmcfg.mySensorLocation
@@ -2246,7 +2300,8 @@ class _Station(object):
 
         self.__channel[(loccfg.code, strmcfg.code, strmcfg.start)] = \
             _Channel(self.__inventory, strmcfg, self.__format_dict,
-            self.__unit_dict, self.__gen_dict, self.__resp_fac.new_response())
+            self.__unit_dict, self.__gen_dict, self.__resp_fac.new_response(),
+            self.__rec_len_exp)
 
     def add_comment(self, qccfg):
         self.__comment_blk.append(_Blockette51(start_time = qccfg.start,
@@ -2272,6 +2327,31 @@ class _Station(object):
 
         f.flush()
             
+def _copy_records(src, dest, recno, rec_len_exp):
+    # copy records from the beginning of a temporary file, renumbering
+    # them starting with recno; the records are 1 << rec_len_exp bytes
+    # long
+    src.seek(0)
+
+    reclen = 1 << rec_len_exp
+    buf = bytearray(_IO_RECORDS * reclen)
+
+    while True:
+        n = src.readinto(buf)
+        if not n:
+            break
+
+        if n % reclen:
+            raise SEEDError, "truncated record in temporary file"
+
+        for i in range(0, n, reclen):
+            buf[i:i+6] = b"%06d" % (recno % 1000000)
+            recno += 1
+
+        dest.write(buf if n == len(buf) else buf[:n])
+
+    return recno
+
 class _TimeSeries(object):
     def __init__(self, span, net_code, stat_code, loc_id, chan_id,
         start_time, end_time, recno):
@@ -2325,8 +2405,8 @@ class _Timespan(object):
         return ts
 
     def overlap(self, start_time, end_time):
-        return self.__start_time - _min_ts_gap <= start_time <= self.__end_time + _min_ts_gap or \
-            self.__start_time - _min_ts_gap <= end_time <= self.__end_time + _min_ts_gap
+        return self.__start_time - _min_span_gap <= start_time <= self.__end_time + _min_span_gap or \
+            self.__start_time - _min_span_gap <= end_time <= self.__end_time + _min_span_gap
     
     def extend(self, start_time, end_time):
         if start_time < self.__start_time:
@@ -2353,25 +2433,77 @@ class _Timespan(object):
         f.flush()
         
 class _WaveformData(object):
-    def __init__(self):
+    def __init__(self, rec_len_exp):
         self.__fd = TemporaryFile()
+        self.__rec_len_exp = rec_len_exp
         self.__recno = 0
         self.__cur_rec = None
         self.__cur_series = None
+        self.__cur_span = None
         self.__span = []
 
-    def __get_time_series(self, rec):
-        for s in self.__span:
-            if s.overlap(rec.begin_time, rec.end_time):
+        # Spans sorted by start time as (start_time, index) pairs, the
+        # current start time of each span and the length of the longest
+        # span. Only spans starting in a window of max_span_len + 2 *
+        # _min_span_gap can overlap a record, so those are the only ones
+        # that need to be checked.
+        self.__span_index = []
+        self.__span_start = []
+        self.__max_span_len = datetime.timedelta(0)
+
+    def __find_span(self, start_time, end_time):
+        # Return the first (in order of creation) span that overlaps the
+        # given time window, like a linear search of self.__span would.
+        lo = start_time - _min_span_gap - self.__max_span_len
+        i = bisect.bisect_right(self.__span_index,
+            (end_time + _min_span_gap, len(self.__span)))
+
+        found = None
+        while i > 0:
+            i -= 1
+            (t, n) = self.__span_index[i]
+            if t < lo:
                 break
-        else:
-            s = _Timespan()
-            self.__span.append(s)
 
-        return s.new_time_series(rec.net, rec.sta, rec.loc, rec.cha,
-            rec.begin_time, rec.end_time, self.__recno)
+            if (found is None or n < found) and \
+                self.__span[n].overlap(start_time, end_time):
+                found = n
+
+        return found
+
+    def __update_span(self, n):
+        (start_time, end_time, recno) = self.__span[n].get_span_data()
+
+        if start_time != self.__span_start[n]:
+            i = bisect.bisect_left(self.__span_index,
+                (self.__span_start[n], n))
+            del self.__span_index[i]
+            bisect.insort(self.__span_index, (start_time, n))
+            self.__span_start[n] = start_time
+
+        if end_time - start_time > self.__max_span_len:
+            self.__max_span_len = end_time - start_time
+
+    def __get_time_series(self, rec):
+        n = self.__find_span(rec.begin_time, rec.end_time)
+        if n is None:
+            n = len(self.__span)
+            self.__span.append(_Timespan())
+            self.__span_start.append(rec.begin_time)
+            bisect.insort(self.__span_index, (rec.begin_time, n))
+
+        ts = self.__span[n].new_time_series(rec.net, rec.sta, rec.loc,
+            rec.cha, rec.begin_time, rec.end_time, self.__recno)
+
+        self.__cur_span = n
+        self.__update_span(n)
+        return ts
 
     def add_data(self, rec):
+        if rec.size > (1 << self.__rec_len_exp):
+            raise SEEDError, "record length %d exceeds the record length " \
+                "of the volume (%d)" % (rec.size, 1 << self.__rec_len_exp)
+
         if self.__cur_rec is None:
             self.__cur_rec = rec
             self.__cur_series = self.__get_time_series(rec)
@@ -2415,8 +2547,12 @@ class _WaveformData(object):
                     rec.X_minus1))
                 contiguous = False
             
-            if contiguous and self.__cur_rec.size + rec.nframes * 64 <= (1 << _RECLEN_EXP):
+            if contiguous and self.__cur_rec.size + rec.nframes * 64 <= \
+                (1 << self.__rec_len_exp):
                 self.__cur_rec.merge(rec)
+                self.__cur_series.extend(rec.begin_time, rec.end_time,
+                    self.__recno)
+                self.__update_span(self.__cur_span)
 
             else:
                 self.__recno += 1
@@ -2424,16 +2560,17 @@ class _WaveformData(object):
                 if abs(rec.begin_time - self.__cur_rec.end_time) <= _min_ts_gap:
                     self.__cur_series.extend(rec.begin_time, rec.end_time,
                         self.__recno)
+                    self.__update_span(self.__cur_span)
                 else:
                     self.__cur_series = self.__get_time_series(rec)
 
-                self.__cur_rec.write(self.__fd, _RECLEN_EXP)
+                self.__cur_rec.write(self.__fd, self.__rec_len_exp)
                 self.__cur_rec = rec
 
         else:
             self.__recno += 1
             self.__cur_series = self.__get_time_series(rec)
-            self.__cur_rec.write(self.__fd, _RECLEN_EXP)
+            self.__cur_rec.write(self.__fd, self.__rec_len_exp)
             self.__cur_rec = rec
 
     def get_series_data(self):
@@ -2452,33 +2589,63 @@ class _WaveformData(object):
     
     def output_data(self, fd, data_start):
         if self.__cur_rec is not None:
-            self.__cur_rec.write(self.__fd, _RECLEN_EXP)
+            self.__cur_rec.write(self.__fd, self.__rec_len_exp)
             self.__cur_rec = None
             self.__cur_series = None
+            self.__cur_span = None
 
-        self.__fd.seek(0)
-        #copyfileobj(self.__fd, fd)
-
-        i = 0
-        for rec in mseed.Input(self.__fd):
-            rec.recno = data_start + i
-            rec.write(fd, _RECLEN_EXP)
-            i += 1
-            
+        # All records in the temporary file have been written by
+        # Record.write() with the final record length, so only the
+        # sequence numbers need to be patched.
+        _copy_records(self.__fd, fd, data_start, self.__rec_len_exp)
         self.__fd.close()
 
+class _NullFile(object):
+    def write(self, s):
+        pass
+
 class _RecordBuilder(object):
-    def __init__(self, type, fd):
+    def __init__(self, type, fd, rec_len_exp=_RECLEN_EXP):
         self.__recno = 1
         self.__type = type
         self.__fd = fd
-        self.__buf = None
+
+        # Records are assembled in place in a buffer of _IO_RECORDS
+        # blank records, which is written out when it is full or when the
+        # builder is flushed.
+        self.__reclen = 1 << rec_len_exp
+        self.__blank = bytearray(b" " * (_IO_RECORDS * self.__reclen))
+        self.__buf = bytearray(self.__blank)
+        self.__nrec = 0
+        self.__pos = None
+
+    def __begin_record(self, cont):
+        if self.__nrec == _IO_RECORDS:
+            self.__write()
+
+        p = self.__nrec * self.__reclen
+        self.__buf[p:p+8] = b"%06d%c%c" % (self.__recno % 1000000,
+            self.__type, ("*" if cont else " "))
+        self.__recno += 1
+        self.__pos = p + 8
+
+    def __write(self):
+        n = self.__nrec * self.__reclen
+        self.__fd.write(memoryview(self.__buf)[:n])
+        self.__buf[:n] = memoryview(self.__blank)[:n]
+        self.__nrec = 0
+
+    def __end_record(self):
+        # the rest of the record is blank already
+        self.__nrec += 1
+        self.__pos = None
 
     def flush(self):
-        if self.__buf != None:
-            self.__buf += ((1 << _RECLEN_EXP) - len(self.__buf)) * " "
-            self.__fd.write(self.__buf)
-            self.__buf = None
+        if self.__pos is not None:
+            self.__end_record()
+
+        if self.__nrec:
+            self.__write()
     
     def reset(self, type, fd, recno = None):
         self.flush()
@@ -2491,27 +2658,46 @@ class _RecordBuilder(object):
         return self.__recno
     
     def write_blk(self, s):
-        if self.__buf == None:
-            self.__buf = "%06d%c " % (self.__recno, self.__type)
-            self.__recno += 1
-        
+        if self.__pos is None:
+            self.__begin_record(False)
+
+        if isinstance(s, unicode):
+            s = s.encode("ascii")
+
+        v = memoryview(s)
         b = 0
-        while len(s) - b > (1 << _RECLEN_EXP) - len(self.__buf):
-            e = b + (1 << _RECLEN_EXP) - len(self.__buf)
-            self.__buf += s[b:e]
-            self.__fd.write(self.__buf)
-                
-            self.__buf = "%06d%c*" % (self.__recno, self.__type)
-            self.__recno += 1
+        while True:
+            rec_end = (self.__nrec + 1) * self.__reclen
+            e = min(len(s), b + rec_end - self.__pos)
+            self.__buf[self.__pos:self.__pos+e-b] = v[b:e]
+            self.__pos += e - b
             b = e
 
-        self.__buf += s[b:]
-            
-        if len(self.__buf) > (1 << _RECLEN_EXP) - 8:
-            self.flush()    
+            if b == len(s):
+                break
+
+            self.__end_record()
+            self.__begin_record(True)
+
+        if rec_end - self.__pos < 8:
+            self.__end_record()
+
+def _format_station(args):
+    # format the control headers of a station in a worker process of
+    # SEEDVolume.spool_stations(); the records are numbered from 1
+    (sta, vol_start, vol_end, rec_len_exp) = args
+    fd = io.BytesIO()
+    rb = _RecordBuilder("S", fd, rec_len_exp)
+    sta.output(rb, vol_start, vol_end)
+    rb.flush()
+    return fd.getvalue()
 
 class SEEDVolume(object):
-    def __init__(self, inventory, organization, label, resp_dict=True):
+    def __init__(self, inventory, organization, label, resp_dict=True,
+        rec_len_exp=_RECLEN_EXP):
+        if not 8 <= rec_len_exp <= 16:
+            raise SEEDError, "invalid record length: %d" % (1 << rec_len_exp)
+
         self.__inventory = inventory
         self.__organization = organization
         self.__label = label or ""
@@ -2522,7 +2708,18 @@ class SEEDVolume(object):
         self.__comment_dict = _CommentDict()
         self.__gen_dict = _GenericAbbreviationDict(inventory)
         self.__station = {}
+        self.__sta_index = None
+        self.__chan_index = None
         self.__waveform_data = None
+        self.__rec_len_exp = rec_len_exp
+
+        # station control headers written by spool_stations(), numbered
+        # from 1, and (stat_code, recno) of each spooled station
+        self.__spool = None
+        self.__spool_rb = None
+        self.__spool_start = 1
+        self.__spooled_sta = []
+        self.__series_found = {}
         
         if resp_dict:
             self.__resp_fac = _Response4xFactory(inventory, self.__unit_dict)
@@ -2530,50 +2727,97 @@ class SEEDVolume(object):
         else:
             self.__resp_fac = _Response5xFactory(inventory, self.__unit_dict)
 
-    def add_chan(self, net_code, stat_code, loc_id, chan_id, start_time, end_time, strict=False):
-        found = False
-        
-        net_tp = self.__inventory.network.get(net_code)
-        if net_tp is not None:
+    def __build_index(self):
+        # Index of station epochs by (net, sta) and of stream epochs by
+        # (net, sta, loc, cha); the stream epochs are sorted by start time
+        # and accompanied by the running maximum of their end times, so
+        # that the epochs overlapping a time window can be found by
+        # bisection. The index is rebuilt after spool_stations(), when the
+        # inventory may have changed.
+        self.__sta_index = {}
+        self.__chan_index = {}
+
+        for (net_code, net_tp) in self.__inventory.network.iteritems():
             for netcfg in net_tp.itervalues():
-#               if _cmptime(start_time, netcfg.end) <= 0 and \
-#                   _cmptime(end_time, netcfg.start) >= 0:
-                    
-                    sta_tp = netcfg.station.get(stat_code)
-                    if sta_tp is not None:
-                        for statcfg in sta_tp.itervalues():
-#                           if _cmptime(start_time, statcfg.end) <= 0 and \
-#                               _cmptime(end_time, statcfg.start) >= 0:
+                for (stat_code, sta_tp) in netcfg.station.iteritems():
+                    for statcfg in sta_tp.itervalues():
+                        self.__sta_index.setdefault((net_code, stat_code),
+                            []).append((netcfg, statcfg))
+
+                        for (loc_id, loc_tp) in statcfg.sensorLocation.iteritems():
+                            for loccfg in loc_tp.itervalues():
+                                for (chan_id, strm_tp) in loccfg.stream.iteritems():
+                                    for strmcfg in strm_tp.itervalues():
+                                        self.__chan_index.setdefault((net_code,
+                                            stat_code, loc_id, chan_id),
+                                            []).append((netcfg, statcfg, strmcfg))
+
+        for (nslc, epochs) in self.__chan_index.iteritems():
+            epochs.sort(key=lambda x: x[2].start)
+            starts = []
+            max_ends = []
+            max_end = None
+
+            for (netcfg, statcfg, strmcfg) in epochs:
+                end = strmcfg.end
+                if end is None:
+                    end = datetime.datetime.max
+
+                if max_end is None or end > max_end:
+                    max_end = end
+
+                starts.append(strmcfg.start)
+                max_ends.append(max_end)
+
+            self.__chan_index[nslc] = (starts, max_ends, epochs)
+
+    def __add_chan(self, net_code, stat_code, loc_id, chan_id, start_time, end_time):
+        found = False
 
-                                sta = self.__station.get((net_code, netcfg.start, stat_code, statcfg.start))
-                                if sta is None:
-                                    sta = _Station(self.__inventory, statcfg, self.__format_dict,
-                                        self.__unit_dict, self.__comment_dict, self.__gen_dict,
-                                        self.__resp_fac)
-                                    self.__station[(net_code, netcfg.start, stat_code, statcfg.start)] = sta
-                                
-                                loc_tp = statcfg.sensorLocation.get(loc_id)
-                                if loc_tp is not None:
-                                    for loccfg in loc_tp.itervalues():
-#                                       if _cmptime(start_time, strmcfg.end) <= 0 and \
-#                                           _cmptime(end_time, strmcfg.start) >= 0:
-
-                                            strm_tp = loccfg.stream.get(chan_id)
-                                            if strm_tp is not None:
-                                                for strmcfg in strm_tp.itervalues():
-                                                    if _cmptime(start_time, strmcfg.end) <= 0 and \
-                                                        _cmptime(end_time, strmcfg.start) >= 0:
-
-                                                        if _cmptime(start_time, self.__vol_start_time) < 0:
-                                                            self.__vol_start_time = start_time
-                                                        
-                                                        if _cmptime(end_time, self.__vol_end_time) > 0:
-                                                            self.__vol_end_time = end_time
-                                                        
-                                                        sta.add_chan(strmcfg)
-                                                        found = True
-        
-        if not found:
+        if self.__chan_index is None:
+            self.__build_index()
+
+        for (netcfg, statcfg) in self.__sta_index.get((net_code, stat_code), []):
+            if (net_code, netcfg.start, stat_code, statcfg.start) not in self.__station:
+                self.__station[(net_code, netcfg.start, stat_code, statcfg.start)] = \
+                    _Station(self.__inventory, statcfg, self.__format_dict,
+                        self.__unit_dict, self.__comment_dict, self.__gen_dict,
+                        self.__resp_fac, self.__rec_len_exp)
+
+        (starts, max_ends, epochs) = self.__chan_index.get((net_code, stat_code,
+            loc_id, chan_id), ([], [], []))
+
+        if end_time is None:
+            i = len(epochs)
+        else:
+            i = bisect.bisect_right(starts, end_time)
+
+        matches = []
+        while i > 0:
+            i -= 1
+            if start_time is not None and max_ends[i] < start_time:
+                break
+
+            (netcfg, statcfg, strmcfg) = epochs[i]
+            if _cmptime(start_time, strmcfg.end) <= 0 and \
+                _cmptime(end_time, strmcfg.start) >= 0:
+                matches.append(epochs[i])
+
+        for (netcfg, statcfg, strmcfg) in reversed(matches):
+            if _cmptime(start_time, self.__vol_start_time) < 0:
+                self.__vol_start_time = start_time
+            
+            if _cmptime(end_time, self.__vol_end_time) > 0:
+                self.__vol_end_time = end_time
+
+            sta = self.__station[(net_code, netcfg.start, stat_code, statcfg.start)]
+            sta.add_chan(strmcfg)
+            found = True
+
+        return found
+
+    def add_chan(self, net_code, stat_code, loc_id, chan_id, start_time, end_time, strict=False):
+        if not self.__add_chan(net_code, stat_code, loc_id, chan_id, start_time, end_time):
             if strict:
                 raise SEEDError, "cannot find %s %s %s %s %s %s" % \
                     (net_code, stat_code, loc_id, chan_id, start_time, end_time)
@@ -2598,7 +2842,8 @@ class SEEDVolume(object):
                                 sta = self.__station.get((net_code, netcfg.start, stat_code, statcfg.start))
                                 if sta is None:
                                     sta = _Station(self.__inventory, statcfg, self.__format_dict,
-                                        self.__unit_dict, self.__gen_dict, self.__resp_fac)
+                                        self.__unit_dict, self.__comment_dict, self.__gen_dict,
+                                        self.__resp_fac, self.__rec_len_exp)
                                     self.__station[(net_code, netcfg.start, stat_code, statcfg.start)] = sta
 
                                 sta.add_comment(start_time, end_time, comment)
@@ -2614,12 +2859,12 @@ class SEEDVolume(object):
     
     def add_data(self, rec):
         if self.__waveform_data is None:
-            self.__waveform_data = _WaveformData()
+            self.__waveform_data = _WaveformData(self.__rec_len_exp)
 
         self.__waveform_data.add_data(rec)
         
-    def __output_vol(self, vol_creat_time, sta_list, rb):
-        b1 = _Blockette10(record_length = _RECLEN_EXP,
+    def __output_vol(self, vol_creat_time, rb):
+        b1 = _Blockette10(record_length = self.__rec_len_exp,
             start_time = self.__vol_start_time,
             end_time = self.__vol_end_time,
             vol_time = vol_creat_time,
@@ -2628,10 +2873,9 @@ class SEEDVolume(object):
 
         b2 = _Blockette11()
 
-        for sta in sta_list:
-            (net_code, net_start, stat_code, stat_start) = sta.get_id()
-            b2.add_station(stat_code, sta.get_recno())
-        
+        for (stat_code, recno) in self.__spooled_sta:
+            b2.add_station(stat_code, self.__spool_start + recno - 1)
+
         b1.output(rb)
         b2.output(rb)
 
@@ -2640,26 +2884,148 @@ class SEEDVolume(object):
         
         rb.flush()
         
-    def output(self, dest, strict=False):
-        vol_creat_time = datetime.datetime.utcnow()
+    def __output_headers(self, vol_creat_time, fd, data_start):
+        rb = _RecordBuilder("V", fd, self.__rec_len_exp)
+        self.__output_vol(vol_creat_time, rb)
+
+        rb.reset("A", fd)
+        self.__format_dict.output(rb)
+        self.__gen_dict.output(rb)
+        self.__unit_dict.output(rb)
+        self.__resp_fac.output(rb)
+        rb.flush()
+
+        # the station control headers have been formatted already by
+        # spool_stations(), so only their records need to be counted
+        self.__spool_start = rb.get_recno()
+
+        if not isinstance(fd, _NullFile):
+            _copy_records(self.__spool, fd, self.__spool_start,
+                self.__rec_len_exp)
+
+        rb.reset("T", fd, self.__spool_start + self.__spool_rb.get_recno() - 1)
 
         if self.__waveform_data is not None:
-            for (net_code, stat_code, loc_id, chan_id, start_time, end_time) in \
-                self.__waveform_data.get_series_data():
-                try:
-                    self.add_chan(net_code, stat_code, loc_id, chan_id, start_time, end_time, strict)
+            self.__waveform_data.output_index(rb, data_start)
+
+        rb.flush()
+        return rb.get_recno()
+
+    def add_data_chans(self, net_code=None, strict=False):
+        # Add the channels of waveform data. If net_code is given, only
+        # series of that network are added, and series that are not found
+        # in the inventory are reported by output() after all networks
+        # have been loaded and spooled.
+        if self.__waveform_data is None:
+            return
+
+        for series in self.__waveform_data.get_series_data():
+            (series_net_code, stat_code, loc_id, chan_id, start_time, end_time) = series
 
-                except SEEDError as e:
-                    if strict:
-                        raise SEEDError, "%s.%s.%s.%s.%s: %s" % \
-                            (net_code, stat_code, loc_id, chan_id, start_time.isoformat(), e)
+            if net_code is not None:
+                # The time span of the volume is written into blockette 52
+                # of each channel, but the channels of networks loaded
+                # later are not known yet, so the time span of all
+                # waveform data is used.
+                if _cmptime(start_time, self.__vol_start_time) < 0:
+                    self.__vol_start_time = start_time
+
+                if _cmptime(end_time, self.__vol_end_time) > 0:
+                    self.__vol_end_time = end_time
+
+                if series_net_code != net_code:
+                    continue
+
+            try:
+                if net_code is None:
+                    self.add_chan(*series, strict=strict)
+
+                else:
+                    found = self.__add_chan(*series)
+                    self.__series_found[series] = self.__series_found.get(series, False) or found
+
+            except SEEDError as e:
+                if strict:
+                    raise SEEDError, "%s.%s.%s.%s.%s: %s" % \
+                        (series_net_code, stat_code, loc_id, chan_id, start_time.isoformat(), e)
+
+                logs.warning("%s.%s.%s.%s.%s: %s" %
+                    (series_net_code, stat_code, loc_id, chan_id, start_time.isoformat(), e))
+
+    def __report_missing(self, strict):
+        if self.__waveform_data is None:
+            return
+
+        for series in self.__waveform_data.get_series_data():
+            if self.__series_found.get(series):
+                continue
+
+            (net_code, stat_code, loc_id, chan_id, start_time, end_time) = series
+
+            if strict:
+                raise SEEDError, "cannot find %s %s %s %s %s %s" % \
+                    (net_code, stat_code, loc_id, chan_id, start_time, end_time)
+            else:
+                logs.warning("cannot find %s %s %s %s %s %s" %
+                    (net_code, stat_code, loc_id, chan_id, start_time, end_time))
 
-                    logs.warning("%s.%s.%s.%s.%s: %s" %
-                        (net_code, stat_code, loc_id, chan_id, start_time.isoformat(), e))
+    def spool_stations(self, pool=None):
+        # Write the control headers of the stations added so far to a
+        # temporary file and release them, so the inventory can be
+        # cleared and loaded with the next network. No more channels can
+        # be added to these stations afterwards.
+        if self.__spool is None:
+            self.__spool = TemporaryFile()
+            self.__spool_rb = _RecordBuilder("S", self.__spool,
+                self.__rec_len_exp)
 
         sta_list = self.__station.values()
         sta_list.sort()
 
+        if pool is not None and len(sta_list) > 1:
+            # The dictionary keys have been resolved when the stations
+            # were added, so the stations can be formatted independently
+            # by the worker processes of pool. The records they return are
+            # numbered from 1, but all spooled records are renumbered by
+            # output().
+            tasks = ((sta, self.__vol_start_time, self.__vol_end_time,
+                self.__rec_len_exp) for sta in sta_list)
+
+            for (sta, blob) in zip(sta_list, pool.imap(_format_station,
+                tasks)):
+                recno = self.__spool_rb.get_recno()
+                self.__spool.write(blob)
+                self.__spool_rb.reset("S", self.__spool,
+                    recno + (len(blob) >> self.__rec_len_exp))
+                self.__spooled_sta.append((sta.get_id()[2], recno))
+
+        else:
+            for sta in sta_list:
+                sta.output(self.__spool_rb, self.__vol_start_time, self.__vol_end_time)
+                self.__spooled_sta.append((sta.get_id()[2], sta.get_recno()))
+
+            self.__spool_rb.flush()
+
+        self.__station = {}
+        self.__sta_index = None
+        self.__chan_index = None
+
+    def output(self, dest, strict=False, pool=None):
+        vol_creat_time = datetime.datetime.utcnow()
+
+        # if stations have been spooled, the caller has added the channels
+        # of waveform data already
+        if self.__spool is None:
+            self.add_data_chans(strict=strict)
+
+        else:
+            self.__report_missing(strict)
+
+        # The station control headers are formatted once, into the spool;
+        # only the small volume, abbreviation and index headers are
+        # formatted twice below.
+        self.spool_stations(pool)
+
         if isinstance(dest, basestring):
             fd = file(dest, "w")
         elif hasattr(dest, "write"):
@@ -2672,34 +3038,16 @@ class SEEDVolume(object):
         except AttributeError:
             filename = '<???>'
 
-        rb = _RecordBuilder("V", fd)
-        self.__output_vol(vol_creat_time, sta_list, rb)
-
-        rb.reset("A", fd)
-        self.__format_dict.output(rb)
-        self.__gen_dict.output(rb)
-        self.__unit_dict.output(rb)
-        self.__resp_fac.output(rb)
-        rb.flush()
-
-        rb.reset("S", fd)
-        for sta in sta_list:
-            sta.output(rb, self.__vol_start_time, self.__vol_end_time)
+        # Record numbers of stations, timespan indices and data records
+        # are referenced in the headers that precede them, so a planning
+        # pass is made first to count the records. Afterwards the volume
+        # is written in one forward pass and dest does not need to be
+        # seekable.
+        data_start = self.__output_headers(vol_creat_time, _NullFile(), 0)
+        data_start = self.__output_headers(vol_creat_time, fd, data_start)
 
         if self.__waveform_data is not None:
-            index_start = rb.get_recno()
-            rb.reset("T", fd)
-            self.__waveform_data.output_index(rb, 0)
-            
-            data_start = rb.get_recno()
-            rb.reset("T", fd, index_start)
-            fd.seek((1 << _RECLEN_EXP) * (index_start - 1), 0)
-            self.__waveform_data.output_index(rb, data_start)
             self.__waveform_data.output_data(fd, data_start)
-        
-        fd.seek(0, 0)
-        rb.reset("V", fd, 1)
-        self.__output_vol(vol_creat_time, sta_list, rb)
 
         if isinstance(dest, basestring):
             fd.close()
@@ -11,16 +11,70 @@
 # version. For more information, see http://www.gnu.org/
 #*****************************************************************************
 
+import os
+import io
+import re
+import sys
+import mmap
 import datetime
 import struct
-import cStringIO
+import fractions
 from fdsnwsscripts.seiscomp import logs
 
+try:
+    import numpy
+    _have_numpy = True
+
+except ImportError:
+    _have_numpy = False
+
 _FIXHEAD_LEN = 48
 _BLKHEAD_LEN = 4
 _BLK1000_LEN = 4
 _BLK1001_LEN = 4
-_MAX_RECLEN = 4096
+_MIN_RECLEN = 256
+_MAX_RECLEN = 65536
+_DEFAULT_RECLEN = 4096
+_MS3HEAD_LEN = 40
+
+_FIXHEAD = struct.Struct(">6scx5s2s3s2s2H3Bx2H2h4Bl2H")
+_WRHEAD = struct.Struct(">6s2c5s2s3s2s2H3Bx2H2h4Bl2H")
+_BLKHEAD = struct.Struct(">2H")
+_BLK1000 = struct.Struct(">3Bx")
+_BLK1001 = struct.Struct(">BbxB")
+_INT32 = struct.Struct(">l")
+_UINT32 = struct.Struct(">L")
+_INT32x2 = struct.Struct(">ll")
+_MS3HEAD = struct.Struct("<2sBBIHHBBBBdIIBBHI")
+
+# start of a plausible miniSEED 2 data record or miniSEED 3 record
+_SYNC = re.compile(b"[0-9 \\x00]{6}[DRQM][ \\x00]|MS\\x03")
+_SYNC_LEN = 8
+
+# miniSEED 3 publication version -> miniSEED 2 quality indicator
+_MS3_QUALITY = { 1: 'R', 2: 'D', 3: 'Q', 4: 'M' }
+
+if sys.version_info[0] >= 3:
+    def _view(src, offset, length):
+        """Zero-copy view of length bytes of src, starting at offset"""
+        return memoryview(src)[offset:offset + length]
+
+    def _str(b):
+        return b.decode('ascii', 'replace')
+
+    def _bytes(s):
+        return s.encode('ascii', 'replace')
+
+else:
+    def _view(src, offset, length):
+        """Zero-copy view of length bytes of src, starting at offset"""
+        return buffer(src, offset, length)
+
+    def _str(b):
+        return b
+
+    def _bytes(s):
+        return s
 
 _doy = (0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334, 365)
 
@@ -54,6 +108,22 @@ def _dy2mdy(doy, year):
 def _mdy2dy(month, day, year):
     return _ldoy(year, month - 1) + day
 
+_NS = 1000000000
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+def _days(year, doy):
+    """The number of days from 1970-01-01 to day doy of year."""
+    y = year - 1
+    return 365 * (year - 1970) + y // 4 - y // 100 + y // 400 - 477 + doy - 1
+
+def _to_ns(t):
+    d = t - _EPOCH
+    return (d.days * 86400 + d.seconds) * _NS + d.microseconds * 1000
+
+def _from_ns(t):
+    return _EPOCH + datetime.timedelta(microseconds = (t + 500) // 1000)
+
 class MSeedError(Exception):
     pass
 
@@ -61,50 +131,84 @@ class MSeedNoData(MSeedError):
     pass
 
 class Record(object):
-    def __init__(self, src):
-        if isinstance(src, basestring):
-            fd = cStringIO.StringIO(src)
+    def __init__(self, src, offset=None, reclen=None, header_only=False):
+        """Parse a record from a string, from a file object or, if offset is
+        given, from a buffer (eg., mmap) at that offset. In the last case
+        header and data are zero-copy views of the buffer.
+
+        Both miniSEED 2 and miniSEED 3 records are supported. Non-data
+        records do not specify their length, so reclen (default 4096) bytes
+        are skipped before MSeedNoData is raised.
+
+        If header_only is True and the file object is seekable, the data
+        section of a miniSEED 2 record is skipped: data is None and the
+        offset of the data section in the file is kept in data_offset,
+        until the data is read explicitly with read_data(). X0, Xn,
+        X_minus1 and nframes (unless given in blockette 1001) are derived
+        lazily from the data, so they are not available before.
+
+        """
+
+        if offset is not None:
+            fd = None
+        elif isinstance(src, (bytes, bytearray)):
+            fd = io.BytesIO(src)
         elif hasattr(src, "read"):
             fd = src
         else:
-            raise TypeError, "argument is neither string nor file object"
+            raise TypeError("argument is neither string nor file object")
 
-        self.header = ""
-        fixhead = fd.read(_FIXHEAD_LEN)
+        if fd is None:
+            fixhead = _view(src, offset, _FIXHEAD_LEN)
+        else:
+            fixhead = fd.read(_FIXHEAD_LEN)
 
         if len(fixhead) == 0:
             raise StopIteration
 
         if len(fixhead) < _FIXHEAD_LEN:
-            raise MSeedError, "unexpected end of header"
+            raise MSeedError("unexpected end of header")
+
+        if fixhead[:3] == b"MS\x03":
+            self.__init_ms3(src, offset, fd, fixhead)
+            return
+
+        self.version = 2
 
         (recno_str, self.rectype, sta, loc, cha, net, bt_year, bt_doy, bt_hour,
             bt_minute, bt_second, bt_tms, self.nsamp, self.sr_factor,
             self.sr_mult, self.aflgs, self.cflgs, self.qflgs, self.__num_blk,
             self.time_correction, self.__pdata, self.__pblk) = \
-            struct.unpack(">6scx5s2s3s2s2H3Bx2H2h4Bl2H", fixhead)
+            _FIXHEAD.unpack(fixhead)
 
-        self.header += fixhead
+        self.rectype = _str(self.rectype)
 
-        if self.rectype != 'D' and self.rectype != 'R' and self.rectype != 'Q' and self.rectype != 'M':
-            fd.read(_MAX_RECLEN - _FIXHEAD_LEN)
-            raise MSeedNoData, "non-data record"
+        if self.rectype in ('V', 'A', 'S', 'T'):
+            if fd is not None:
+                fd.read((reclen or _DEFAULT_RECLEN) - _FIXHEAD_LEN)
 
-        if self.__pdata < _FIXHEAD_LEN or self.__pdata >= _MAX_RECLEN or \
+            raise MSeedNoData("non-data record")
+
+        if self.rectype not in ('D', 'R', 'Q', 'M'):
+            raise MSeedError("invalid record type")
+
+        # records without data samples (eg., blockette 2000) have no data
+        # offset; the blockettes that precede blockette 1000 are expected
+        # within the minimum record length
+        hdrlen = self.__pdata or _MIN_RECLEN
+
+        if (self.__pdata != 0 and self.__pdata < _FIXHEAD_LEN) or \
             (self.__pblk != 0 and \
-            (self.__pblk < _FIXHEAD_LEN or self.__pblk >= self.__pdata)):
-            raise MSeedError, "invalid pointers"
+            (self.__pblk < _FIXHEAD_LEN or self.__pblk >= hdrlen)):
+            raise MSeedError("invalid pointers")
 
-        if self.__pblk == 0:
-            blklen = 0
+        if fd is None:
+            self.header = _view(src, offset, hdrlen)
         else:
-            blklen = self.__pdata - self.__pblk
-            gaplen = self.__pblk - _FIXHEAD_LEN
-            gap = fd.read(gaplen)
-            if len(gap) < gaplen:
-                raise MSeedError, "unexpected end of data"
+            self.header = fixhead + fd.read(hdrlen - _FIXHEAD_LEN)
 
-            self.header += gap
+        if len(self.header) < hdrlen:
+            raise MSeedError("unexpected end of data")
 
         # defaults
         self.encoding = 11
@@ -112,79 +216,58 @@ class Record(object):
         rec_len_exp = 12
         self.time_quality = -1
         micros = 0
-        self.nframes = None
+        nframes = 0
         self.__rec_len_exp_idx = None
         self.__micros_idx = None
         self.__nframes_idx = None
 
-        pos = 0
-        while pos < blklen:
-            blkhead = fd.read(_BLKHEAD_LEN)
-            if len(blkhead) < _BLKHEAD_LEN:
-                raise MSeedError, "unexpected end of blockettes at ", \
-                    pos + len(blkhead)
+        blk = self.__pblk
+        while blk != 0:
+            if blk + _BLKHEAD_LEN > hdrlen:
+                raise MSeedError("unexpected end of blockettes at %d" % blk)
 
-            (blktype, nextblk) = struct.unpack(">2H", blkhead)
-            self.header += blkhead
-            pos += _BLKHEAD_LEN
+            (blktype, nextblk) = _BLKHEAD.unpack_from(self.header, blk)
 
             if blktype == 1000:
-                blk1000 = fd.read(_BLK1000_LEN)
-                if len(blk1000) < _BLK1000_LEN:
-                    raise MSeedError, "unexpected end of blockettes at ", \
-                        pos + len(blk1000)
+                if blk + _BLKHEAD_LEN + _BLK1000_LEN > hdrlen:
+                    raise MSeedError("unexpected end of blockettes at %d" % blk)
 
                 (self.encoding, self.byteorder, rec_len_exp) = \
-                    struct.unpack(">3Bx", blk1000)
+                    _BLK1000.unpack_from(self.header, blk + _BLKHEAD_LEN)
 
-                self.__rec_len_exp_idx = self.__pblk + pos + 2
-                self.header += blk1000
-                pos += _BLK1000_LEN
+                self.__rec_len_exp_idx = blk + 6
 
             elif blktype == 1001:
-                blk1001 = fd.read(_BLK1001_LEN)
-                if len(blk1001) < _BLK1001_LEN:
-                    raise MSeedError, "unexpected end of blockettes at ", \
-                        pos + len(blk1001)
+                if blk + _BLKHEAD_LEN + _BLK1001_LEN > hdrlen:
+                    raise MSeedError("unexpected end of blockettes at %d" % blk)
 
-                (self.time_quality, micros, self.nframes) = \
-                    struct.unpack(">BbxB", blk1001)
+                (self.time_quality, micros, nframes) = \
+                    _BLK1001.unpack_from(self.header, blk + _BLKHEAD_LEN)
 
-                self.__micros_idx = self.__pblk + pos + 1
-                self.__nframes_idx = self.__pblk + pos + 3
-                self.header += blk1001
-                pos += _BLK1001_LEN
+                self.__micros_idx = blk + 5
+                self.__nframes_idx = blk + 7
 
             if nextblk == 0:
                 break
 
-            if nextblk < self.__pblk + pos or nextblk >= self.__pdata:
-                raise MSeedError, "invalid pointers"
-
-            gaplen = nextblk - (self.__pblk + pos)
-            gap = fd.read(gaplen)
-            if len(gap) < gaplen:
-                raise MSeedError, "unexpected end of data"
-
-            self.header += gap
-            pos += gaplen
+            if self.__pdata == 0 and nextblk >= hdrlen and \
+                self.__rec_len_exp_idx is not None:
+                # the remaining blockettes are kept as data
+                break
 
-        if pos > blklen:
-            raise MSeedError, "corrupt record"
+            if nextblk < blk + _BLKHEAD_LEN or nextblk >= hdrlen:
+                raise MSeedError("invalid pointers")
 
-        gaplen = self.__pdata - len(self.header)
-        gap = fd.read(gaplen)
-        if len(gap) < gaplen:
-            raise MSeedError, "unexpected end of data"
+            blk = nextblk
 
-        self.header += gap
-        pos += gaplen
+        if nframes:
+            self.nframes = nframes
 
         self.recno = int(recno_str)
-        self.net = net.strip()
-        self.sta = sta.strip()
-        self.loc = loc.strip()
-        self.cha = cha.strip()
+        self.net = _str(net).strip()
+        self.sta = _str(sta).strip()
+        self.loc = _str(loc).strip()
+        self.cha = _str(cha).strip()
 
         if self.sr_factor > 0 and self.sr_mult > 0:
             self.samprate_num = self.sr_factor * self.sr_mult
@@ -211,39 +294,189 @@ class Record(object):
         else:
             self.leap = 0
 
-        try:
-            (month, day) = _dy2mdy(bt_doy, bt_year)
-            self.begin_time = datetime.datetime(bt_year, month, day, bt_hour,
-                bt_minute, bt_second)
+        if bt_year < 1 or bt_year > 9999 or bt_doy < 1 or \
+            bt_doy > 365 + _is_leap(bt_year) or bt_hour > 23 or bt_minute > 59:
+            raise MSeedError("invalid time: %d,%03d,%02d:%02d:%02d" %
+                (bt_year, bt_doy, bt_hour, bt_minute, bt_second))
 
-            self.begin_time += datetime.timedelta(microseconds = bt_tms * 100 + micros)
+        # times are kept as integer nanoseconds since 1970-01-01; the
+        # begin_time and end_time properties create datetime objects lazily
+        self.begin_ns = ((_days(bt_year, bt_doy) * 86400 + bt_hour * 3600 +
+            bt_minute * 60 + bt_second) * _NS + (bt_tms * 100 + micros) * 1000)
 
-            if self.nsamp != 0 and self.fsamp != 0:
-                self.end_time = self.begin_time + \
-                    datetime.timedelta(microseconds = 1000000 * self.nsamp / self.fsamp)
-            else:
-                self.end_time = self.begin_time
+        if self.nsamp != 0 and self.samprate_num != 0:
+            self.end_ns = self.begin_ns + self.nsamp * _NS * \
+                self.samprate_denom // self.samprate_num
+        else:
+            self.end_ns = self.begin_ns
 
-        except ValueError, e:
-            logs.error("tms = " + str(bt_tms) + ", micros = " + str(micros))
-            raise MSeedError, "invalid time: " + str(e)
+        self.__begin_time = (None, None)
+        self.__end_time = (None, None)
 
         self.size = 1 << rec_len_exp
         if self.size < len(self.header) or self.size > _MAX_RECLEN:
-            raise MSeedError, "invalid record size"
+            raise MSeedError("invalid record size")
+
+        datalen = self.size - hdrlen
+
+        if fd is None:
+            self.data = _view(src, offset + hdrlen, datalen)
+        elif header_only and self.__skip_data(fd, datalen):
+            return
+        else:
+            self.data = fd.read(datalen)
 
-        datalen = self.size - self.__pdata
-        self.data = fd.read(datalen)
         if len(self.data) < datalen:
-            raise MSeedError, "unexpected end of data"
+            raise MSeedError("unexpected end of data")
+
+        if len(self.header) + len(self.data) != self.size:
+            raise MSeedError("internal error")
+
+    def __skip_data(self, fd, datalen):
+        try:
+            pos = fd.tell()
+            fd.seek(datalen, 1)
+
+        except (AttributeError, IOError, OSError, ValueError):
+            # not seekable
+            return False
+
+        # no reference to fd is kept; the data is only read by read_data()
+        self.data = None
+        self.data_offset = pos
+        return True
+
+    def read_data(self, fd):
+        """Read the data section of a record that has been parsed with
+        header_only=True from fd, the file it has been parsed from. The
+        file position of fd is not changed."""
+
+        if self.data is None:
+            datalen = self.size - len(self.header)
+            pos = fd.tell()
+            fd.seek(self.data_offset)
+            data = fd.read(datalen)
+            fd.seek(pos)
+
+            if len(data) < datalen:
+                raise MSeedError("unexpected end of data")
+
+            self.data = data
+
+        return self.data
+
+    def __check_data(self):
+        if self.data is None:
+            raise MSeedError("data section has not been read")
+
+    def __getattr__(self, name):
+        # only called for attributes that are not set yet
+        if name in ('X0', 'Xn', 'X_minus1', 'nframes'):
+            self.__scan_frames()
+            return self.__dict__[name]
+
+        raise AttributeError(name)
+
+    def __init_ms3(self, src, offset, fd, fixhead):
+        """Parse a miniSEED 3 record. The CRC is not verified."""
+
+        self.version = 3
+
+        (indicator, version, self.flags, nanosecond, bt_year, bt_doy,
+            bt_hour, bt_minute, bt_second, self.encoding, samprate,
+            self.nsamp, self.crc, pubversion, sidlen, extralen, datalen) = \
+            _MS3HEAD.unpack_from(fixhead)
+
+        hdrlen = _MS3HEAD_LEN + sidlen + extralen
+        self.size = hdrlen + datalen
+
+        if self.size < _FIXHEAD_LEN or self.size > _MAX_RECLEN:
+            raise MSeedError("invalid record size")
+
+        if fd is None:
+            self.header = _view(src, offset, hdrlen)
+            self.data = _view(src, offset + hdrlen, datalen)
+
+        else:
+            rest = fd.read(self.size - _FIXHEAD_LEN)
+            self.header = (fixhead + rest)[:hdrlen]
+            self.data = (fixhead + rest)[hdrlen:]
 
         if len(self.header) + len(self.data) != self.size:
-            raise MSeedError, "internal error"
+            raise MSeedError("unexpected end of data")
+
+        self.sid = _str(bytes(self.header[_MS3HEAD_LEN:_MS3HEAD_LEN + sidlen]))
+        codes = self.sid[5:].split('_')
+
+        if not self.sid.startswith("FDSN:") or len(codes) != 6:
+            raise MSeedError("unsupported source identifier: " + self.sid)
+
+        (self.net, self.sta, self.loc) = codes[:3]
+
+        if len(codes[3]) == 1 and len(codes[4]) == 1 and len(codes[5]) == 1:
+            self.cha = ''.join(codes[3:])
+        else:
+            self.cha = '_'.join(codes[3:])
+
+        self.rectype = _MS3_QUALITY.get(pubversion, 'D')
+        self.recno = 0
+        self.time_quality = -1
+
+        # Steim frames are big-endian, other encodings little-endian
+        self.byteorder = int(self.encoding in (10, 11))
+
+        if samprate > 0:
+            rate = fractions.Fraction(samprate).limit_denominator(1000000)
+            (self.samprate_num, self.samprate_denom) = \
+                (rate.numerator, rate.denominator)
+        elif samprate < 0:
+            period = fractions.Fraction(-samprate).limit_denominator(1000000)
+            (self.samprate_num, self.samprate_denom) = \
+                (period.denominator, period.numerator)
+        else:
+            (self.samprate_num, self.samprate_denom) = (0, 1)
+
+        self.fsamp = float(self.samprate_num) / float(self.samprate_denom)
+
+        if bt_second > 59:
+            self.leap = bt_second - 59
+            bt_second = 59
+        else:
+            self.leap = 0
+
+        if bt_year < 1 or bt_year > 9999 or bt_doy < 1 or \
+            bt_doy > 365 + _is_leap(bt_year) or bt_hour > 23 or \
+            bt_minute > 59 or nanosecond >= _NS:
+            raise MSeedError("invalid time: %d,%03d,%02d:%02d:%02d" %
+                (bt_year, bt_doy, bt_hour, bt_minute, bt_second))
+
+        self.begin_ns = (_days(bt_year, bt_doy) * 86400 + bt_hour * 3600 +
+            bt_minute * 60 + bt_second) * _NS + nanosecond
 
-        (self.X0, self.Xn) = struct.unpack(">ll", self.data[4:12])
+        if self.nsamp != 0 and self.samprate_num != 0:
+            self.end_ns = self.begin_ns + self.nsamp * _NS * \
+                self.samprate_denom // self.samprate_num
+        else:
+            self.end_ns = self.begin_ns
+
+        self.__begin_time = (None, None)
+        self.__end_time = (None, None)
+
+    def __scan_frames(self):
+        """Get the integration constants, X[-1] and the number of frames
+        of Steim data"""
+
+        self.__check_data()
 
-        (w0,) = struct.unpack(">L", self.data[:4])
-        (w3,) = struct.unpack(">L", self.data[12:16])
+        if len(self.data) < 16:
+            self.X0 = self.Xn = self.X_minus1 = None
+            self.nframes = self.__dict__.get('nframes', 0)
+            return
+
+        (self.X0, self.Xn) = _INT32x2.unpack_from(self.data, 4)
+
+        (w0,) = _UINT32.unpack_from(self.data, 0)
+        (w3,) = _UINT32.unpack_from(self.data, 12)
         c3 = (w0 >> 24) & 0x3
         d0 = None
 
@@ -303,79 +536,782 @@ class Record(object):
         else:
             self.X_minus1 = None
 
-        if self.nframes is None or self.nframes == 0:
+        if not self.__dict__.get('nframes'):
             i = 0
             self.nframes = 0
             while i < len(self.data):
-                if self.data[i] == "\0":
+                if self.data[i:i + 1] == b"\0":
                     break
 
                 i += 64
                 self.nframes += 1
 
+    def __get_begin_time(self):
+        if self.__begin_time[0] != self.begin_ns:
+            self.__begin_time = (self.begin_ns, _from_ns(self.begin_ns))
+
+        return self.__begin_time[1]
+
+    def __set_begin_time(self, t):
+        self.begin_ns = _to_ns(t)
+
+    def __get_end_time(self):
+        if self.__end_time[0] != self.end_ns:
+            self.__end_time = (self.end_ns, _from_ns(self.end_ns))
+
+        return self.__end_time[1]
+
+    def __set_end_time(self, t):
+        self.end_ns = _to_ns(t)
+
+    begin_time = property(__get_begin_time, __set_begin_time)
+    end_time = property(__get_end_time, __set_end_time)
+
+    def get_samples(self):
+        """Decode the samples of the record into a NumPy array"""
+        self.__check_data()
+
+        if self.encoding == 10 or self.encoding == 11:
+            if self.byteorder != 1:
+                raise MSeedError("little-endian Steim data is not supported")
+
+            return steim_decode(self.data, self.nsamp, self.encoding,
+                self.nframes or None)
+
+        try:
+            dtype = _PLAIN_DTYPES[self.encoding]
+
+        except KeyError:
+            raise MSeedError("unsupported encoding %d" % self.encoding)
+
+        if not _have_numpy:
+            raise MSeedError("numpy not installed")
+
+        dtype = ('<', '>')[self.byteorder] + dtype
+        return numpy.frombuffer(self.data, dtype=dtype, count=self.nsamp)
+
     def merge(self, rec):
         """
         Caller is expected to check for contiguity of data
         Check if rec.nframes * 64 <= len(data)?
 
         """
-        (self.Xn,) = struct.unpack(">l", rec.data[8:12])
+        if self.version != 2 or rec.version != 2:
+            raise MSeedError("cannot merge miniSEED 3 records")
+
+        if rec.data is None:
+            raise MSeedError("data section has not been read")
+
+        if 'X0' not in self.__dict__:
+            # derive the fields before they are updated
+            self.__scan_frames()
+
+        (self.Xn,) = _INT32.unpack_from(rec.data, 8)
+
+        if not isinstance(self.data, bytearray):
+            # drop unused frames, so that they do not end up in the middle
+            self.data = bytearray(self.data[:self.nframes * 64])
+
         self.data += rec.data[:rec.nframes * 64]
         self.nframes += rec.nframes
         self.nsamp += rec.nsamp
         self.size = len(self.header) + len(self.data)
-        self.end_time = rec.end_time
+        self.end_ns = rec.end_ns
 
     def write(self, fd, rec_len_exp):
+        if self.version != 2:
+            raise MSeedError("cannot write miniSEED 3 records")
+
+        self.__check_data()
+
         if self.size > (1 << rec_len_exp):
-            raise MSeedError, "record is larger than requested write size"
-
-        recno_str = "%06d" % (self.recno,)
-        sta = "%-5.5s" % (self.sta,)
-        loc = "%-2.2s" % (self.loc,)
-        cha = "%-3.3s" % (self.cha,)
-        net = "%-2.2s" % (self.net,)
-        bt_year = self.begin_time.year
-        bt_doy = _mdy2dy(self.begin_time.month, self.begin_time.day,
-            self.begin_time.year)
-        bt_hour = self.begin_time.hour
-        bt_minute = self.begin_time.minute
-        bt_second = self.begin_time.second + self.leap
-        bt_tms = self.begin_time.microsecond // 100
-        micros = self.begin_time.microsecond % 100
-
-        buf = struct.pack(">6s2c5s2s3s2s2H3Bx2H2h4Bl2H", recno_str,
-            self.rectype, ' ', sta, loc, cha, net, bt_year, bt_doy, bt_hour,
-            bt_minute, bt_second, bt_tms, self.nsamp, self.sr_factor,
-            self.sr_mult, self.aflgs, self.cflgs, self.qflgs, self.__num_blk,
+            raise MSeedError("record is larger than requested write size")
+
+        recno_str = _bytes("%06d" % (self.recno,))
+        sta = _bytes("%-5.5s" % (self.sta,))
+        loc = _bytes("%-2.2s" % (self.loc,))
+        cha = _bytes("%-3.3s" % (self.cha,))
+        net = _bytes("%-2.2s" % (self.net,))
+        (days, usec) = divmod((self.begin_ns + 500) // 1000, 86400000000)
+        date = datetime.date.fromordinal(_EPOCH_ORDINAL + days)
+        bt_year = date.year
+        bt_doy = _mdy2dy(date.month, date.day, date.year)
+        (bt_hour, usec) = divmod(usec, 3600000000)
+        (bt_minute, usec) = divmod(usec, 60000000)
+        (bt_second, usec) = divmod(usec, 1000000)
+        bt_second += self.leap
+        bt_tms = usec // 100
+        micros = usec % 100
+
+        # the tail of the record is left zero-filled
+        buf = bytearray(1 << rec_len_exp)
+
+        _WRHEAD.pack_into(buf, 0, recno_str, _bytes(self.rectype), b' ',
+            sta, loc, cha, net, bt_year, bt_doy, bt_hour, bt_minute,
+            bt_second, bt_tms, self.nsamp, self.sr_factor, self.sr_mult,
+            self.aflgs, self.cflgs, self.qflgs, self.__num_blk,
             self.time_correction, self.__pdata, self.__pblk)
 
-        fd.write(buf)
-
-        buf = list(self.header[_FIXHEAD_LEN:])
+        pdata = len(self.header)
+        buf[_FIXHEAD_LEN:pdata] = self.header[_FIXHEAD_LEN:]
 
         if self.__rec_len_exp_idx is not None:
-            buf[self.__rec_len_exp_idx - _FIXHEAD_LEN] = struct.pack(">B", rec_len_exp)
+            buf[self.__rec_len_exp_idx] = rec_len_exp
 
         if self.__micros_idx is not None:
-            buf[self.__micros_idx - _FIXHEAD_LEN] = struct.pack(">b", micros)
+            buf[self.__micros_idx] = micros & 0xff
 
         if self.__nframes_idx is not None:
-            buf[self.__nframes_idx - _FIXHEAD_LEN] = struct.pack(">B", self.nframes)
+            # the number of frames of records longer than 16 KiB does not
+            # fit into blockette 1001
+            buf[self.__nframes_idx] = self.nframes if self.nframes < 256 else 0
 
-        fd.write(''.join(buf))
+        buf[pdata:pdata + len(self.data)] = self.data
 
-        buf = self.data[:4] + struct.pack(">ll", self.X0, self.Xn) + \
-            self.data[12:] + ((1 << rec_len_exp) - self.size) * '\0'
+        if (self.encoding == 10 or self.encoding == 11) and self.nframes > 0 \
+            and self.X0 is not None:
+            # the integration constants of merged Steim data
+            _INT32x2.pack_into(buf, pdata + 4, self.X0, self.Xn)
 
         fd.write(buf)
 
-class Input(object):
+class _ResyncReader(object):
+    """File-like wrapper that can push back data, capture the data read
+    by Record() and skip to the next plausible record header"""
+
     def __init__(self, fd):
         self.__fd = fd
+        self.__buf = bytearray()
+        self.__off = 0
+        self.__captured = None
+        self.pos = 0
+
+    def read(self, size):
+        # pushed back data is consumed from __off on; the buffer is only
+        # compacted when more than half of it has been consumed
+        if self.__off < len(self.__buf):
+            end = min(self.__off + size, len(self.__buf))
+            data = bytes(self.__buf[self.__off:end])
+            self.__off = end
+
+            if self.__off == len(self.__buf):
+                del self.__buf[:]
+                self.__off = 0
+
+            elif self.__off > len(self.__buf) // 2:
+                del self.__buf[:self.__off]
+                self.__off = 0
+
+            if len(data) < size:
+                data += self.__fd.read(size - len(data))
+
+        else:
+            data = self.__fd.read(size)
+
+        if self.__captured is not None:
+            self.__captured.append(data)
+
+        self.pos += len(data)
+        return data
+
+    def unread(self, data):
+        if len(data) <= self.__off:
+            self.__off -= len(data)
+            self.__buf[self.__off:self.__off + len(data)] = data
+
+        else:
+            self.__buf[:self.__off] = data
+            self.__off = 0
+
+        self.pos -= len(data)
+
+    def mark(self):
+        self.__captured = []
+
+    def captured(self):
+        data = b"".join(self.__captured)
+        self.__captured = None
+        return data
+
+    def sync(self):
+        """Skip to the next plausible record header. Returns False if
+        there is none."""
+
+        data = b""
+        while True:
+            chunk = self.read(_DEFAULT_RECLEN * 16)
+            data = data[-(_SYNC_LEN - 1):] + chunk
+            m = _SYNC.search(data)
+
+            if m:
+                self.unread(data[m.start():])
+                return True
+
+            if not chunk:
+                return False
+
+class Input(object):
+    def __init__(self, fd, mapped=False, resync=False, header_only=False):
+        """If mapped is True, fd must be a regular file, which is
+        memory-mapped; records are then read without copying, starting at
+        the current position of fd.
+
+        If resync is True, corrupt data does not end the iteration, but is
+        skipped up to the next plausible record header. The skipped byte
+        ranges, relative to the start of iteration, are logged and
+        collected in the list skipped.
+
+        If header_only is True, data sections of seekable files are
+        skipped and can be read with Record.read_data(fd) (see Record);
+        memory-mapped records never copy data.
+
+        """
+        self.__fd = fd
+        self.__mapped = mapped
+        self.__resync = resync
+        self.__header_only = header_only
+        self.skipped = []
+
+    def __skip(self, start, end, e):
+        logs.warning("skipped %d bytes of corrupt data at offset %d: %s" %
+            (end - start, start, str(e)))
+
+        self.skipped.append((start, end))
 
     def __iter__(self):
+        # non-data records (eg., SEED control headers) are skipped; their
+        # length is assumed to be that of the last miniSEED 2 data record
+        reclen = None
+        error = None
+
+        if self.__mapped:
+            offset = start = self.__fd.tell()
+            self.__fd.flush()
+
+            if os.fstat(self.__fd.fileno()).st_size <= offset:
+                return
+
+            buf = mmap.mmap(self.__fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+            while True:
+                try:
+                    rec = Record(buf, offset)
+
+                except StopIteration:
+                    break
+
+                except MSeedNoData:
+                    offset += reclen or _DEFAULT_RECLEN
+                    continue
+
+                except MSeedError as e:
+                    if not self.__resync:
+                        raise
+
+                    if error is None:
+                        error = (offset, e)
+
+                    m = _SYNC.search(buf, offset + 1)
+                    offset = m.start() if m else len(buf)
+                    continue
+
+                if error is not None:
+                    self.__skip(error[0] - start, offset - start, error[1])
+                    error = None
+
+                if rec.version == 2:
+                    reclen = rec.size
+
+                offset += rec.size
+                yield rec
+
+            if error is not None:
+                self.__skip(error[0] - start, len(buf) - start, error[1])
+
+            return
+
+        if self.__resync:
+            fd = _ResyncReader(self.__fd)
+
+        else:
+            fd = self.__fd
+
         while True:
-            # Record() raises StopIteration!
-            yield Record(self.__fd)
+            if self.__resync:
+                fd.mark()
+                offset = fd.pos
+
+            try:
+                rec = Record(fd, reclen=reclen, header_only=self.__header_only)
+
+            except StopIteration:
+                break
+
+            except MSeedNoData:
+                continue
+
+            except MSeedError as e:
+                if not self.__resync:
+                    raise
+
+                if error is None:
+                    error = (offset, e)
+
+                # rescan everything but the first byte of the failed record
+                fd.unread(fd.captured()[1:])
+                fd.sync()
+                continue
+
+            if error is not None:
+                self.__skip(error[0], offset, error[1])
+                error = None
+
+            if rec.version == 2:
+                reclen = rec.size
+
+            yield rec
+
+        if error is not None:
+            self.__skip(error[0], fd.pos, error[1])
+
+def find_record(buf, offset):
+    """Return the offset of the first record in buf (eg., mmap) that starts
+    at or after offset, or len(buf) if there is none. A plausible header
+    is accepted if both the record and the record following it can be
+    parsed."""
+
+    while True:
+        m = _SYNC.search(buf, offset)
+
+        if not m:
+            return len(buf)
+
+        try:
+            rec = Record(buf, m.start())
+
+            if m.start() + rec.size < len(buf):
+                Record(buf, m.start() + rec.size)
+
+            return m.start()
+
+        except (MSeedError, StopIteration):
+            offset = m.start() + 1
+
+def _mergeable(prev, rec, rec_len_exp):
+    """True if the Steim frames of rec can be appended to prev in a record
+    of at most 2^rec_len_exp bytes"""
+
+    return prev.version == 2 and rec.version == 2 and \
+        (rec.encoding == 10 or rec.encoding == 11) and \
+        prev.encoding == rec.encoding and prev.byteorder == rec.byteorder and \
+        prev.rectype == rec.rectype and prev.fsamp == rec.fsamp and \
+        rec.fsamp > 0 and rec.X_minus1 is not None and \
+        prev.Xn == rec.X_minus1 and \
+        abs(rec.begin_ns - prev.end_ns) <= _NS / (rec.fsamp * 10) and \
+        prev.nsamp + rec.nsamp <= 0xffff and \
+        len(prev.header) + prev.nframes * 64 + rec.nframes * 64 <= \
+            (1 << rec_len_exp)
+
+def reblock(records, rec_len_exp):
+    """Pack contiguous Steim records of each channel into records of up to
+    2^rec_len_exp bytes, eg., 512 byte records into 4096 byte records.
+
+    records is an iterable of Record objects (eg., Input) that may mix
+    channels. Yields (rec, merged) pairs; merged records are to be written
+    with Record.write(fd, rec_len_exp), while records into which nothing
+    could be merged are yielded unchanged and keep their own length.
+    Records of a channel stay in order, but records of different channels
+    are reordered.
+
+    """
+    cur = {}
+
+    for rec in records:
+        key = (rec.net, rec.sta, rec.loc, rec.cha)
+        prev = cur.get(key)
+
+        if prev is not None:
+            if _mergeable(prev[0], rec, rec_len_exp):
+                prev[0].merge(rec)
+                prev[1] = True
+                continue
+
+            yield tuple(prev)
+
+        cur[key] = [rec, False]
+
+    for prev in sorted(cur.values(), key=lambda p: p[0].begin_ns):
+        yield tuple(prev)
+
+
+_FIXHEAD_DTYPE = [('seqno', 'S6'), ('rectype', 'S1'), ('reserved', 'S1'),
+    ('sta', 'S5'), ('loc', 'S2'), ('cha', 'S3'), ('net', 'S2'),
+    ('year', '>u2'), ('doy', '>u2'), ('hour', 'u1'), ('minute', 'u1'),
+    ('second', 'u1'), ('unused', 'u1'), ('tms', '>u2'), ('nsamp', '>u2'),
+    ('sr_factor', '>i2'), ('sr_mult', '>i2'), ('aflgs', 'u1'),
+    ('cflgs', 'u1'), ('qflgs', 'u1'), ('num_blk', 'u1'),
+    ('time_correction', '>i4'), ('pdata', '>u2'), ('pblk', '>u2')]
+
+INDEX_DTYPE = [('offset', 'i8'), ('net', 'S2'), ('sta', 'S5'), ('loc', 'S2'),
+    ('cha', 'S3'), ('starttime', 'i8'), ('nsamp', 'i4'), ('samprate', 'f8'),
+    ('encoding', 'u1'), ('reclen', 'i4')]
+
+def _gather(raw, pos, width):
+    return raw[pos[:, None] + numpy.arange(width)]
+
+def _column(raw, pos, reclen, dtype):
+    """Strided view of the field at offset pos of each record of a buffer
+    of reclen byte records"""
+    return numpy.ndarray((len(raw) // reclen,), dtype, raw, pos, (reclen,))
+
+def _uniform_records(raw):
+    """Locate the blockettes 1000 and 1001 of a buffer of equally sized
+    records without walking the records one by one. Returns None if the
+    records are not uniform."""
+
+    if len(raw) < _FIXHEAD_LEN:
+        return None
+
+    pblk = int(raw[46]) << 8 | int(raw[47])
+    if pblk < _FIXHEAD_LEN or pblk + 8 > 64 or \
+        (int(raw[pblk]) << 8 | int(raw[pblk + 1])) != 1000:
+        return None
+
+    reclen = 1 << int(raw[pblk + 6])
+    if reclen < _FIXHEAD_LEN + 8 or len(raw) % reclen != 0:
+        return None
+
+    offsets = numpy.arange(0, len(raw), reclen, dtype='i8')
+
+    # all records must be data records with blockette 1000 at the same
+    # position and the same record length
+    if not numpy.all(numpy.isin(_column(raw, 6, reclen, 'u1'),
+            numpy.frombuffer(b"DRQM", 'u1'))) or \
+        not numpy.all(_column(raw, 46, reclen, '>u2') == pblk) or \
+        not numpy.all(_column(raw, pblk, reclen, '>u2') == 1000) or \
+        not numpy.all(_column(raw, pblk + 6, reclen, 'u1') == raw[pblk + 6]):
+        return None
+
+    b1000 = numpy.empty(len(offsets), dtype='i8')
+    b1000.fill(pblk)
+
+    # blockette 1001, if any, directly follows blockette 1000
+    b1001 = numpy.empty(len(offsets), dtype='i8')
+    b1001.fill(-1)
+    found = (_column(raw, pblk + 2, reclen, '>u2') == pblk + 8)
+
+    if pblk + 12 <= 64:
+        found &= (_column(raw, pblk + 8, reclen, '>u2') == 1001)
+        b1001[found] = pblk + 8
+
+    elif numpy.any(found):
+        return None
+
+    return (offsets, b1000, b1001, len(raw))
+
+def _walk_records(buf):
+    """Locate the blockettes 1000 and 1001 of each record by walking the
+    blockette chains. Stops at an incomplete record at the end of the
+    buffer and returns its offset as well."""
+
+    offsets = []
+    b1000_list = []
+    b1001_list = []
+    pos = 0
+
+    while pos + _FIXHEAD_LEN <= len(buf):
+        (rectype,) = struct.unpack_from(">c", buf, pos + 6)
+        (pdata, pblk) = _BLKHEAD.unpack_from(buf, pos + 44)
+
+        if rectype not in b"DRQM":
+            if pos + _DEFAULT_RECLEN > len(buf):
+                break
+
+            pos += _DEFAULT_RECLEN
+            continue
+
+        b1000 = b1001 = -1
+        blk = pblk
+
+        while blk != 0:
+            if blk < _FIXHEAD_LEN:
+                raise MSeedError("invalid pointers at offset %d" % pos)
+
+            if pos + blk + _BLKHEAD_LEN > len(buf):
+                break
+
+            (blktype, nextblk) = _BLKHEAD.unpack_from(buf, pos + blk)
+
+            if blktype == 1000:
+                b1000 = blk
+
+            elif blktype == 1001:
+                b1001 = blk
+
+            if nextblk != 0 and nextblk <= blk:
+                raise MSeedError("invalid pointers at offset %d" % pos)
+
+            blk = nextblk
+
+        if blk != 0:
+            # blockette chain cut off by the end of the buffer
+            break
+
+        if b1000 == -1:
+            raise MSeedError("blockette 1000 not found at offset %d" % pos)
+
+        if pos + b1000 + _BLKHEAD_LEN + _BLK1000_LEN > len(buf):
+            break
+
+        (rec_len_exp,) = struct.unpack_from(">B", buf, pos + b1000 + 6)
+
+        if pos + (1 << rec_len_exp) > len(buf):
+            break
+
+        offsets.append(pos)
+        b1000_list.append(b1000)
+        b1001_list.append(b1001)
+        pos += 1 << rec_len_exp
+
+    return (numpy.array(offsets, dtype='i8'), numpy.array(b1000_list, dtype='i8'),
+        numpy.array(b1001_list, dtype='i8'), pos)
+
+def header_index(buf):
+    """Index all data records of a buffer (string, mmap or any object
+    supporting the buffer interface) at once.
+
+    Returns a NumPy structured array of INDEX_DTYPE with one element per
+    record. Codes are stripped, start times are integer nanoseconds since
+    1970-01-01 and sample rates are in Hz. An incomplete record at the end
+    of the buffer is not indexed and a warning is logged.
+
+    """
+    if not _have_numpy:
+        raise MSeedError("numpy not installed")
+
+    raw = numpy.frombuffer(buf, dtype='u1')
+
+    loc = _uniform_records(raw)
+    if loc is None:
+        loc = _walk_records(buf)
+
+    (offsets, b1000, b1001, end) = loc
+    if end < len(raw):
+        logs.warning("%d bytes of incomplete record at offset %d not indexed"
+            % (len(raw) - end, end))
+
+    index = numpy.zeros(len(offsets), dtype=INDEX_DTYPE)
+
+    if len(offsets) == 0:
+        return index
+
+    head = _gather(raw, offsets, _FIXHEAD_LEN)
+    codes = head[:, 8:20]
+    codes[codes == ord(' ')] = 0
+    fixhead = head.view(_FIXHEAD_DTYPE).reshape(len(offsets))
+
+    index['offset'] = offsets
+    index['net'] = fixhead['net']
+    index['sta'] = fixhead['sta']
+    index['loc'] = fixhead['loc']
+    index['cha'] = fixhead['cha']
+    index['nsamp'] = fixhead['nsamp']
+
+    blk1000 = _gather(raw, offsets + b1000, 8)
+    index['encoding'] = blk1000[:, 4]
+    index['reclen'] = 1 << blk1000[:, 6].astype('i4')
+
+    micros = numpy.zeros(len(offsets), dtype='i8')
+    has1001 = b1001 >= 0
+    if numpy.any(has1001):
+        micros[has1001] = raw[offsets[has1001] + b1001[has1001] + 5].view('i1')
+
+    (year, doy, hour, minute, second, tms) = [fixhead[f].astype('i8')
+        for f in ('year', 'doy', 'hour', 'minute', 'second', 'tms')]
+
+    days = (year - 1970) * 365 + (year - 1) // 4 - (year - 1) // 100 + \
+        (year - 1) // 400 - 477 + doy - 1
+
+    seconds = days * 86400 + hour * 3600 + minute * 60 + second
+    index['starttime'] = (seconds * 1000000 + tms * 100 + micros) * 1000
+
+    factor = fixhead['sr_factor'].astype('f8')
+    mult = fixhead['sr_mult'].astype('f8')
+    samprate = numpy.zeros(len(offsets), dtype='f8')
+
+    sel = (factor > 0) & (mult > 0)
+    samprate[sel] = factor[sel] * mult[sel]
+    sel = (factor > 0) & (mult < 0)
+    samprate[sel] = -factor[sel] / mult[sel]
+    sel = (factor < 0) & (mult > 0)
+    samprate[sel] = -mult[sel] / factor[sel]
+    sel = (factor < 0) & (mult < 0)
+    samprate[sel] = 1.0 / (factor[sel] * mult[sel])
+    index['samprate'] = samprate
+
+    return index
+
+# encoding -> sample type of uncompressed data
+_PLAIN_DTYPES = { 1: 'i2', 3: 'i4', 4: 'f4', 5: 'f8' }
+
+# (count, bits) of differences in a word, indexed by 4 * code + dnib;
+# count 0 marks a word that carries no differences
+_STEIM1_WORDS = ([(0, 0)] * 4 + [(4, 8)] * 4 + [(2, 16)] * 4 + [(1, 32)] * 4)
+_STEIM2_WORDS = ([(0, 0)] * 4 + [(4, 8)] * 4 +
+    [(-1, 0), (1, 30), (2, 15), (3, 10)] + [(5, 6), (6, 5), (7, 4), (-1, 0)])
+
+# word layouts tried by the encoder, in order: (count, bits, code, dnib)
+_STEIM1_ENC = ((4, 8, 1, 0), (2, 16, 2, 0), (1, 32, 3, 0))
+_STEIM2_ENC = ((7, 4, 3, 2), (6, 5, 3, 1), (5, 6, 3, 0), (4, 8, 1, 0),
+    (3, 10, 2, 3), (2, 15, 2, 2), (1, 30, 2, 1))
+
+def _signed32(x):
+    return x - ((x & 0x80000000) << 1)
+
+def steim_decode(data, nsamp, encoding, nframes=None):
+    """Decode nsamp samples from Steim1 (encoding=10) or Steim2
+    (encoding=11) frames. Returns a NumPy int32 array."""
+
+    if not _have_numpy:
+        raise MSeedError("numpy not installed")
+
+    if encoding == 10:
+        table = _STEIM1_WORDS
+    elif encoding == 11:
+        table = _STEIM2_WORDS
+    else:
+        raise MSeedError("encoding %d is not Steim" % encoding)
+
+    if nframes is None:
+        nframes = len(data) // 64
+
+    if nsamp == 0:
+        return numpy.zeros(0, dtype='i4')
+
+    if nframes == 0 or nframes * 64 > len(data):
+        raise MSeedError("invalid number of Steim frames")
+
+    words = numpy.frombuffer(data, dtype='>u4', count=nframes * 16).astype('i8')
+    words = words.reshape(nframes, 16)
+    codes = (words[:, :1] >> (30 - 2 * numpy.arange(16))) & 3
+
+    # the nibble word and the integration constants carry no differences
+    codes[:, 0] = 0
+    codes[0, 1:3] = 0
+
+    x0 = _signed32(int(words[0, 1]))
+    xn = _signed32(int(words[0, 2]))
+
+    words = words.ravel()
+    key = 4 * codes.ravel() + ((words >> 30) & 3) * (codes.ravel() > 1)
+    (counts, bits) = numpy.array(table, dtype='i8').T
+    count = counts[key]
+    bits = bits[key]
+
+    if numpy.any(count < 0):
+        raise MSeedError("invalid Steim2 difference word")
+
+    start = numpy.cumsum(count) - count
+    if count.sum() < nsamp:
+        raise MSeedError("Steim frames contain %d differences, expected %d" %
+            (count.sum(), nsamp))
+
+    diffs = numpy.zeros(count.sum(), dtype='i8')
+
+    for (n, b) in set(t for t in table if t[0] > 0):
+        sel = (count == n) & (bits == b)
+        if not numpy.any(sel):
+            continue
+
+        w = words[sel]
+        st = start[sel]
+        mask = (1 << b) - 1
+        sign = 1 << (b - 1)
+
+        for j in range(n):
+            v = (w >> (b * (n - 1 - j))) & mask
+            diffs[st + j] = v - ((v & sign) << 1)
+
+    diffs[0] = 0
+    samples = x0 + numpy.cumsum(diffs[:nsamp])
+
+    if samples[-1] != xn:
+        logs.warning("Steim integrity check failed: last sample %d, Xn %d" %
+            (samples[-1], xn))
+
+    return samples.astype('i4')
+
+def steim_encode(samples, encoding, max_frames, x_minus1=None):
+    """Encode samples into at most max_frames Steim1 (encoding=10) or
+    Steim2 (encoding=11) frames. x_minus1 is the last sample of the
+    previous record, if any.
+
+    Returns (frames, nsamp, nframes), where nsamp is the number of samples
+    that fit and frames is a string of nframes * 64 bytes.
+
+    """
+    if not _have_numpy:
+        raise MSeedError("numpy not installed")
+
+    if encoding == 10:
+        layouts = _STEIM1_ENC
+    elif encoding == 11:
+        layouts = _STEIM2_ENC
+    else:
+        raise MSeedError("encoding %d is not Steim" % encoding)
+
+    samples = numpy.asarray(samples, dtype='i8')
+    if len(samples) == 0 or max_frames < 1:
+        raise MSeedError("nothing to encode")
+
+    if x_minus1 is None:
+        x_minus1 = samples[0]
+
+    diffs = numpy.diff(numpy.concatenate(([x_minus1], samples)))
+
+    # number of differences before each position that do not fit into
+    # the given number of bits
+    nofit = {}
+    for (n, b, code, dnib) in layouts:
+        bad = (diffs < -(1 << (b - 1))) | (diffs >= (1 << (b - 1)))
+        nofit[b] = numpy.concatenate(([0], numpy.cumsum(bad))).tolist()
+
+    slots = 13 + 15 * (max_frames - 1)
+    layout = []
+    i = 0
+
+    while i < len(diffs) and len(layout) < slots:
+        for (n, b, code, dnib) in layouts:
+            if i + n <= len(diffs) and nofit[b][i + n] == nofit[b][i]:
+                layout.append((i, n, b, code, dnib))
+                i += n
+                break
+
+        else:
+            raise MSeedError("difference %d does not fit into Steim%d" %
+                (diffs[i], encoding - 9))
+
+    (st, count, bits, code, dnib) = numpy.array(layout, dtype='i8').T
+
+    out = numpy.where(code > 1, dnib << 30, 0)
+    for (n, b, c, d) in layouts:
+        sel = (count == n) & (bits == b)
+        if not numpy.any(sel):
+            continue
+
+        for j in range(n):
+            out[sel] |= (diffs[st[sel] + j] & ((1 << b) - 1)) << (b * (n - 1 - j))
+
+    # position of each word in the frames
+    k = numpy.arange(len(layout))
+    frame = numpy.where(k < 13, 0, (k + 2) // 15)
+    slot = numpy.where(k < 13, k + 3, (k + 2) % 15 + 1)
+
+    nframes = frame[-1] + 1
+    frames = numpy.zeros((nframes, 16), dtype='i8')
+    frames[frame, slot] = out
+    numpy.add.at(frames[:, 0], frame, code << (30 - 2 * slot))
+    frames[0, 1] = samples[0]
+    frames[0, 2] = samples[i - 1]
 
+    return ((frames & 0xffffffff).astype('>u4').tobytes(), i, nframes)
@@ -0,0 +1,78 @@
+import io
+import sys
+import unittest
+
+if sys.version_info[0] >= 3:
+    raise unittest.SkipTest("fdsnxml requires Python 2")
+
+from fdsnwsscripts.seiscomp import fdsnxml
+from fdsnwsscripts.seiscomp.test_fseed import make_stationxml, make_channel
+
+
+def channels(inv):
+    """Return the channels of an inventory as a sorted list of (net, sta,
+    loc, cha, start, gain, sensor description)"""
+
+    result = []
+
+    for net_tp in inv.network.values():
+        for net in net_tp.values():
+            for sta_tp in net.station.values():
+                for sta in sta_tp.values():
+                    for loc_tp in sta.sensorLocation.values():
+                        for loc in loc_tp.values():
+                            for cha_tp in loc.stream.values():
+                                for cha in cha_tp.values():
+                                    result.append((net.code, sta.code,
+                                        loc.code, cha.code, cha.start,
+                                        cha.gain,
+                                        inv.sensor[cha.sensor].description))
+
+    return sorted(result)
+
+
+class IterloadTest(unittest.TestCase):
+    def setUp(self):
+        # two epochs of GE and networks in no particular order
+        self.xml = make_stationxml([
+            ("ZZ", [("APE", [make_channel("LHZ", 1.0)])]),
+            ("GE", [("APE", [make_channel("BH" + c, 20.0) for c in "ZNE"]),
+                ("BOAB", [make_channel("HHZ", 100.0, loc="00")])]),
+            ("XX", [("ABC", [make_channel("HHZ", 100.0, gain=800.0)])])]
+        ).replace('<Network code="XX" startDate="2010-01-01T00:00:00">',
+            '<Network code="GE" startDate="2005-01-01T00:00:00">')
+
+    def test_iterload(self):
+        inv = fdsnxml.Inventory()
+        inv.load_fdsnxml(io.BytesIO(self.xml))
+        expected = channels(inv)
+        self.assertEqual(len(expected), 6)
+
+        inv = fdsnxml.Inventory()
+        loaded = []
+        nets = []
+
+        for net_code in inv.iterload_fdsnxml(io.BytesIO(self.xml)):
+            nets.append(net_code)
+            chans = channels(inv)
+            loaded += chans
+
+            # only the last network is in the inventory, with the
+            # instruments of its channels
+            self.assertEqual(set(c[0] for c in chans), set([net_code]))
+            self.assertEqual(len(inv.network[net_code]), 1)
+            self.assertEqual(len(inv.sensor), len(chans))
+            self.assertEqual(len(inv.datalogger), len(chans))
+            inv.clear()
+
+            self.assertEqual(inv.network, {})
+            self.assertEqual(inv.sensor, {})
+            self.assertEqual(inv.responsePAZ, {})
+            self.assertEqual(inv.responseFIR, {})
+
+        self.assertEqual(nets, ["ZZ", "GE", "GE"])
+        self.assertEqual(sorted(loaded), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
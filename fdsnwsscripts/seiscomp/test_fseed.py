@@ -0,0 +1,604 @@
+import io
+import sys
+import datetime
+import tempfile
+import unittest
+import multiprocessing
+
+if sys.version_info[0] >= 3:
+    raise unittest.SkipTest("fseed requires Python 2")
+
+from fdsnwsscripts.seiscomp import fdsnxml, fseed, mseedlite, logs
+from fdsnwsscripts.seiscomp.test_mseedlite import make_stream, random_walk
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+PAZ = """<PolesZeros><InputUnits><Name>M/S</Name></InputUnits><OutputUnits>\
+<Name>V</Name></OutputUnits><PzTransferFunctionType>LAPLACE (RADIANS/SECOND)\
+</PzTransferFunctionType><NormalizationFactor>%g</NormalizationFactor>\
+<NormalizationFrequency>1</NormalizationFrequency><Zero number="0"><Real>0\
+</Real><Imaginary>0</Imaginary></Zero><Pole number="0"><Real>-0.037</Real>\
+<Imaginary>0.037</Imaginary></Pole></PolesZeros>"""
+
+DIGITIZER = """<Coefficients><InputUnits><Name>V</Name></InputUnits>\
+<OutputUnits><Name>COUNTS</Name></OutputUnits><CfTransferFunctionType>DIGITAL\
+</CfTransferFunctionType></Coefficients>"""
+
+FIR = """<FIR><InputUnits><Name>COUNTS</Name></InputUnits><OutputUnits><Name>\
+COUNTS</Name></OutputUnits><Symmetry>NONE</Symmetry>%s</FIR>"""
+
+STAGE = """<Stage number="%d">%s<Decimation><InputSampleRate>%g\
+</InputSampleRate><Factor>%d</Factor><Offset>0</Offset><Delay>0</Delay>\
+<Correction>0</Correction></Decimation><StageGain><Value>%g</Value>\
+<Frequency>1</Frequency></StageGain></Stage>"""
+
+CHANNEL = """<Channel code="%s" locationCode="%s" startDate="%s"%s><Latitude>1\
+</Latitude><Longitude>2</Longitude><Elevation>3</Elevation><Depth>0</Depth>\
+<Azimuth>0</Azimuth><Dip>-90</Dip><SampleRate>%g</SampleRate><Response>\
+<InstrumentSensitivity><Value>%g</Value><Frequency>1</Frequency><InputUnits>\
+<Name>M/S</Name></InputUnits><OutputUnits><Name>COUNTS</Name></OutputUnits>\
+</InstrumentSensitivity>%s</Response></Channel>"""
+
+STATION = """<Station code="%s" startDate="2010-01-01T00:00:00"><Latitude>1\
+</Latitude><Longitude>2</Longitude><Elevation>3</Elevation><Site><Name>Site\
+ %s</Name></Site>%s</Station>"""
+
+NETWORK = """<Network code="%s" startDate="2010-01-01T00:00:00"><Description>\
+Network %s</Description>%s</Network>"""
+
+STATIONXML = """<?xml version="1.0"?><FDSNStationXML \
+xmlns="http://www.fdsn.org/xml/station/1" schemaVersion="1.0"><Source>test\
+</Source><Created>2020-01-01T00:00:00</Created>%s</FDSNStationXML>"""
+
+
+def make_channel(code, rate, loc="", start="2010-01-01T00:00:00", end=None,
+                 norm=1.0, gain=1500.0, fir=(0.25, 0.5, 0.25)):
+    """A channel with a PAZ sensor, a digitizer and a FIR filter"""
+
+    coeff = "".join('<NumeratorCoefficient i="%d">%g</NumeratorCoefficient>'
+        % (i, c) for (i, c) in enumerate(fir))
+
+    stages = STAGE % (1, PAZ % norm, rate, 1, gain) + \
+        STAGE % (2, DIGITIZER, rate * 2, 1, 400000.0) + \
+        STAGE % (3, FIR % coeff, rate * 2, 2, 1.0)
+
+    return CHANNEL % (code, loc, start, ' endDate="%s"' % end if end else "",
+        rate, gain * 400000.0, stages)
+
+
+def make_stationxml(networks):
+    """networks is a list of (net_code, [(sta_code, [channel, ...]), ...])"""
+
+    return STATIONXML % "".join(NETWORK % (net, net, "".join(STATION %
+        (sta, sta, "".join(chans)) for (sta, chans) in stations))
+        for (net, stations) in networks)
+
+
+def make_inventory(networks):
+    inv = fdsnxml.Inventory()
+    inv.load_fdsnxml(io.BytesIO(make_stationxml(networks)))
+    return inv
+
+
+def split_headers(data, rec_len_exp=12):
+    """Return the control headers of a volume as a list of (record number,
+    record type, blockettes), where blockettes is the blockette text of a
+    record and its continuation records"""
+
+    reclen = 1 << rec_len_exp
+    result = []
+
+    for p in range(0, len(data), reclen):
+        (recno, rectype, cont) = (int(data[p:p+6]), data[p+6], data[p+7])
+
+        if rectype == "D":
+            break
+
+        if cont == "*":
+            result[-1][2].append(data[p+8:p+reclen])
+
+        else:
+            result.append((recno, rectype, [data[p+8:p+reclen]]))
+
+    return [(recno, rectype, "".join(text).rstrip())
+        for (recno, rectype, text) in result]
+
+
+def blockettes(text):
+    """Split the blockette text of a control header"""
+
+    result = []
+    p = 0
+
+    while p < len(text):
+        n = int(text[p+3:p+7])
+        result.append(text[p:p+n])
+        p += n
+
+    return result
+
+
+def volume_index(data, rec_len_exp=12):
+    """Return the number of records of a volume, the (station, record
+    number) pairs of blockette 11 and the (start, end, record number)
+    triples of blockette 12; the referenced records are checked"""
+
+    headers = split_headers(data, rec_len_exp)
+    records = dict((recno, (rectype, text))
+        for (recno, rectype, text) in headers)
+
+    stations = []
+    spans = []
+
+    for blk in blockettes(headers[0][2]):
+        if blk.startswith("011"):
+            for i in range(int(blk[7:10])):
+                (code, recno) = (blk[10+11*i:15+11*i].strip(),
+                    int(blk[15+11*i:21+11*i]))
+
+                assert records[recno][0] == "S"
+                assert records[recno][1].startswith("050")
+                assert records[recno][1][7:12].strip() == code
+                stations.append((code, recno))
+
+        elif blk.startswith("012"):
+            for i in range(int(blk[7:11])):
+                b = blk[11+52*i:63+52*i]
+                (start, end, recno) = (b[:22], b[23:45], int(b[46:52]))
+                assert records[recno][0] == "T"
+                assert records[recno][1].startswith("070")
+                assert records[recno][1][8:30] == start
+                spans.append((start, end, recno))
+
+    return (len(data) >> rec_len_exp, stations, spans)
+
+
+def mask_volume(data, rec_len_exp=12):
+    """Return the control headers of a volume, without the creation time
+    (blockette 10) and the names of FIR responses (blockette 61), which
+    are derived from object ids, and the data records"""
+
+    reclen = 1 << rec_len_exp
+    headers = []
+
+    for (recno, rectype, text) in split_headers(data, rec_len_exp):
+        blks = blockettes(text)
+
+        for (i, blk) in enumerate(blks):
+            if blk.startswith("010"):
+                t = blk.split("~")
+                blks[i] = "~".join(t[:2] + [""] + t[3:])
+
+            elif blk.startswith("061"):
+                blks[i] = blk[:9] + blk[blk.index("~"):]
+
+        headers.append((recno, rectype, blks))
+
+    p = 0
+    while p < len(data) and data[p+6] != "D":
+        p += reclen
+
+    return (headers, data[p:])
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class TimespanTest(unittest.TestCase):
+    def find_span(self, wd, start_time, end_time):
+        return wd._WaveformData__find_span(start_time, end_time)
+
+    def linear_search(self, wd, start_time, end_time):
+        for (n, s) in enumerate(wd._WaveformData__span):
+            if s.overlap(start_time, end_time):
+                return n
+
+        return None
+
+    def test_index(self):
+        # short streams of many channels at random times, some of them
+        # overlapping each other and some separated by gaps
+        rnd = numpy.random.RandomState(1)
+        t0 = datetime.datetime(2020, 1, 1)
+        wd = fseed._WaveformData(12)
+
+        for i in range(300):
+            start = t0 + datetime.timedelta(seconds=int(rnd.randint(0, 86400)))
+            samples = random_walk(int(rnd.randint(1, 5000)), i)
+            recs = make_stream("S%d" % (i % 7), "HH" + "ZNE"[i % 3], start,
+                100, samples)
+
+            for rec in mseedlite.Input(io.BytesIO(b"".join(recs))):
+                wd.add_data(rec)
+
+        spans = wd._WaveformData__span
+        self.assertTrue(10 < len(spans) < 300)
+
+        for i in range(2000):
+            start = t0 + datetime.timedelta(seconds=int(rnd.randint(-600,
+                87000)))
+
+            end = start + datetime.timedelta(seconds=int(rnd.randint(0,
+                3600)))
+
+            self.assertEqual(self.find_span(wd, start, end),
+                self.linear_search(wd, start, end))
+
+    def test_gap(self):
+        # data separated by more than _min_span_gap is put into separate
+        # spans; a merged record extends its time series and span
+        t0 = datetime.datetime(2020, 1, 1)
+        t1 = t0 + datetime.timedelta(minutes=30)
+        wd = fseed._WaveformData(12)
+        recs = make_stream("ABC", "HHZ", t0, 100, random_walk(3000, 1)) + \
+            make_stream("ABC", "HHN", t1, 100, random_walk(3000, 2)) + \
+            make_stream("ABC", "HHE", t0, 100, random_walk(3000, 3))
+
+        for rec in mseedlite.Input(io.BytesIO(b"".join(recs))):
+            wd.add_data(rec)
+
+        t2 = t0 + datetime.timedelta(seconds=30)
+        t3 = t1 + datetime.timedelta(seconds=30)
+        self.assertEqual([s.get_span_data()[:2]
+            for s in wd._WaveformData__span], [(t0, t2), (t1, t3)])
+
+        self.assertEqual([d[3:] for d in wd.get_series_data()],
+            [("HHZ", t0, t2), ("HHE", t0, t2), ("HHN", t1, t3)])
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class VolumeTest(unittest.TestCase):
+    def setUp(self):
+        self.saved_warning = logs.warning
+        logs.warning = lambda s: None
+
+        # three networks, two stations with the same code and a station
+        # with many channels, whose headers continue over several records
+        self.xml = make_stationxml([
+            ("GE", [("APE", [make_channel(c, 20.0) for c in "ZNE"]),
+                ("BOAB", [make_channel("BH" + c, 20.0) for c in "ZNE"])]),
+            ("XX", [("ABC", [make_channel("HH" + c, 100.0, loc)
+                for c in "ZNE" for loc in ("", "00", "10", "20", "30")])]),
+            ("ZZ", [("APE", [make_channel("LHZ", 1.0)])])])
+
+        self.inv = fdsnxml.Inventory()
+        self.inv.load_fdsnxml(io.BytesIO(self.xml))
+
+        t0 = datetime.datetime(2020, 1, 1)
+        t1 = datetime.datetime(2020, 1, 1, 6)
+        recs = make_stream("APE", "Z", t0, 20, random_walk(20000, 1), 12,
+            net="GE") + \
+            make_stream("BOAB", "BHN", t0, 20, random_walk(5000, 2), 12,
+            net="GE") + \
+            make_stream("ABC", "HHE", t1, 100, random_walk(50000, 3), 12,
+            loc="10") + \
+            make_stream("APE", "LHZ", t1, 1, random_walk(3000, 4), 12,
+            net="ZZ")
+
+        self.data = b"".join(recs)
+
+    def tearDown(self):
+        logs.warning = self.saved_warning
+
+    def volume(self, dataless, **kwargs):
+        vol = fseed.SEEDVolume(self.inv, "TEST", "test", False)
+
+        if dataless:
+            for (net, sta, loc, cha) in [("GE", "APE", "", "Z"),
+                ("GE", "APE", "", "N"), ("GE", "BOAB", "", "BHE"),
+                ("ZZ", "APE", "", "LHZ")] + [("XX", "ABC", loc, "HH" + c)
+                for c in "ZNE" for loc in ("", "00", "10", "20", "30")]:
+                vol.add_chan(net, sta, loc, cha,
+                    datetime.datetime(2020, 1, 1),
+                    datetime.datetime(2020, 1, 2))
+
+        else:
+            for rec in mseedlite.Input(io.BytesIO(self.data)):
+                vol.add_data(rec)
+
+        fd = io.BytesIO()
+        vol.output(fd, **kwargs)
+        return fd.getvalue()
+
+    def test_dataless(self):
+        self.assertEqual(volume_index(self.volume(True)),
+            (8, [("APE", 3), ("BOAB", 4), ("ABC", 5), ("APE", 8)], []))
+
+    def test_full(self):
+        data = self.volume(False)
+        self.assertEqual(volume_index(data), (49, [("APE", 3), ("BOAB", 4),
+            ("ABC", 5), ("APE", 6)],
+            [("2020,001,00:00:00.0000", "2020,001,00:16:40.0000", 7),
+            ("2020,001,06:00:00.0000", "2020,001,06:50:00.0000", 8)]))
+
+        # the data records follow the headers, renumbered
+        nrec = len(self.data) >> 12
+        self.assertEqual(nrec, 41)
+
+        for i in range(nrec):
+            self.assertEqual(data[(8 + i) << 12:(9 + i) << 12],
+                b"%06d" % (9 + i) + self.data[(i << 12) + 6:(i + 1) << 12])
+
+    def test_index_records(self):
+        # the planning pass counts the header records of a volume whose
+        # volume and index headers are longer than the output buffer; the
+        # channel changes with each chunk of data, so each chunk starts a
+        # time series and a time span
+        t0 = datetime.datetime(2020, 1, 1)
+        vol = fseed.SEEDVolume(self.inv, "TEST", "test", False, 8)
+        recs = []
+
+        for i in range(300):
+            recs += make_stream("APE", "ZNE"[i % 3], t0 + datetime.timedelta(
+                minutes=3 * i), 20, random_walk(500, i), 8, net="GE")
+
+        for rec in mseedlite.Input(io.BytesIO(b"".join(recs))):
+            vol.add_data(rec)
+
+        fd = io.BytesIO()
+        vol.output(fd)
+        data = fd.getvalue()
+
+        (nrec, stations, spans) = volume_index(data, 8)
+        headers = split_headers(data, 8)
+        data_start = int(data[len(data) - (len(recs) << 8):][:6])
+        self.assertEqual(len(spans), 300)
+        self.assertEqual(nrec, data_start - 1 + len(recs))
+        self.assertTrue(data_start > fseed._IO_RECORDS)
+        self.assertEqual(data[(data_start - 1) << 8:][6], "D")
+        self.assertEqual(data[(data_start - 2) << 8:][6], "T")
+
+        # the time series index points at the data records
+        for (recno, rectype, text) in headers:
+            for blk in blockettes(text):
+                if blk.startswith("074"):
+                    for p in (40, 71):
+                        d = data[(int(blk[p:p+6]) - 1) << 8:]
+                        self.assertEqual(d[6], "D")
+                        self.assertEqual(d[8:20], blk[7:17] + "GE")
+                        self.assertEqual(int(d[:6]), int(blk[p:p+6]))
+
+    def incremental(self, pool):
+        # spool the stations one network at a time, like fdsnws2seed -i
+        inv = fdsnxml.Inventory()
+        vol = fseed.SEEDVolume(inv, "TEST", "test", False)
+
+        for rec in mseedlite.Input(io.BytesIO(self.data)):
+            vol.add_data(rec)
+
+        for net_code in inv.iterload_fdsnxml(io.BytesIO(self.xml)):
+            vol.add_data_chans(net_code)
+            vol.spool_stations(pool)
+            inv.clear()
+
+        fd = io.BytesIO()
+        vol.output(fd, pool=pool)
+        return fd.getvalue()
+
+    def test_processes(self):
+        # the stations formatted by a pool of worker processes, which is
+        # shared by all calls of spool_stations(), give the same volume
+        pool = multiprocessing.Pool(2)
+
+        try:
+            for dataless in (True, False):
+                self.assertEqual(mask_volume(self.volume(dataless,
+                    pool=pool)), mask_volume(self.volume(dataless)))
+
+            data = self.incremental(pool)
+            self.assertEqual(volume_index(data)[:2],
+                volume_index(self.volume(False))[:2])
+
+            self.assertEqual(mask_volume(data),
+                mask_volume(self.incremental(None)))
+
+        finally:
+            pool.close()
+            pool.join()
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class EpochTest(unittest.TestCase):
+    # overlapping epochs, short epochs that end before a longer epoch
+    # started earlier, and gaps; BHZ has an epoch without end
+    EPOCHS = [("2011-01-01", "2011-06-01"), ("2011-03-01", "2015-01-01"),
+        ("2012-01-01", "2012-02-01"), ("2013-01-01", "2013-01-02"),
+        ("2014-01-01", "2016-01-01"), ("2014-06-01", "2014-07-01"),
+        ("2017-01-01", "2017-01-02"), ("2018-01-01", "2019-01-01")]
+
+    def setUp(self):
+        self.saved_warning = logs.warning
+        logs.warning = lambda s: None
+
+        self.inv = make_inventory([("XX", [("ABC",
+            [make_channel("BHZ", 20.0, start="2010-06-01T00:00:00")] +
+            [make_channel(c, 20.0, start=start + "T00:00:00",
+                end=end + "T00:00:00")
+                for (start, end) in self.EPOCHS for c in ("BHZ", "BHN")])])])
+
+    def tearDown(self):
+        logs.warning = self.saved_warning
+
+    def add_chan(self, cha, start_time, end_time):
+        vol = fseed.SEEDVolume(self.inv, "TEST", "test", False)
+        found = vol._SEEDVolume__add_chan("XX", "ABC", "", cha, start_time,
+            end_time)
+
+        return (found, sorted(key[2] for sta in
+            vol._SEEDVolume__station.values()
+            for key in sta._Station__channel))
+
+    def linear_scan(self, cha, start_time, end_time):
+        starts = []
+
+        for netcfg in self.inv.network["XX"].values():
+            for statcfg in netcfg.station["ABC"].values():
+                for loccfg in statcfg.sensorLocation[""].values():
+                    for strmcfg in loccfg.stream.get(cha, {}).values():
+                        if fseed._cmptime(start_time, strmcfg.end) <= 0 and \
+                            fseed._cmptime(end_time, strmcfg.start) >= 0:
+                            starts.append(strmcfg.start)
+
+        return (len(starts) > 0, sorted(starts))
+
+    def test_index(self):
+        rnd = numpy.random.RandomState(1)
+        t0 = datetime.datetime(2009, 1, 1)
+        times = [None] + [datetime.datetime(*map(int, t.split("-")))
+            for epoch in self.EPOCHS for t in epoch]
+
+        windows = [(start, end) for start in times for end in times
+            if start is None or end is None or start <= end]
+
+        for i in range(300):
+            start = t0 + datetime.timedelta(days=int(rnd.randint(0, 3800)))
+            end = start + datetime.timedelta(days=int(rnd.randint(0, 400)))
+            windows.append((start, end))
+
+        for cha in ("BHZ", "BHN"):
+            for (start, end) in windows:
+                self.assertEqual(self.add_chan(cha, start, end),
+                    self.linear_scan(cha, start, end))
+
+        # a window in a gap and one after all epochs
+        self.assertEqual(self.add_chan("BHN", datetime.datetime(2016, 6, 1),
+            datetime.datetime(2016, 7, 1)), (False, []))
+
+        self.assertEqual(self.add_chan("BHN", datetime.datetime(2020, 1, 1),
+            None), (False, []))
+
+
+class ResponseTest(unittest.TestCase):
+    def test_dictionary(self):
+        # BHZ and BHN share their sensor, digitizer and FIR filter, while
+        # the sensor of BHE has a different normalization factor
+        inv = make_inventory([("GE", [("APE", [make_channel("BHZ", 20.0),
+            make_channel("BHN", 20.0),
+            make_channel("BHE", 20.0, norm=2.0)])])])
+
+        vol = fseed.SEEDVolume(inv, "TEST", "test", True)
+
+        for cha in ("BHZ", "BHN", "BHE"):
+            vol.add_chan("GE", "APE", "", cha, datetime.datetime(2020, 1, 1),
+                datetime.datetime(2020, 1, 2))
+
+        fd = io.BytesIO()
+        vol.output(fd)
+
+        count = {}
+        refs = {}
+
+        for (recno, rectype, text) in split_headers(fd.getvalue()):
+            cha = None
+
+            for blk in blockettes(text):
+                count[blk[:3]] = count.get(blk[:3], 0) + 1
+
+                if blk.startswith("052"):
+                    cha = blk[9:12]
+
+                elif blk.startswith("060"):
+                    refs[cha] = blk[7:]
+
+        # PAZ (43), coefficients (44), FIR (41), decimation (47) and gain
+        # (48) dictionary blockettes
+        self.assertEqual([count.get(b, 0) for b in ("043", "044", "041",
+            "047", "048")], [2, 1, 1, 2, 3])
+
+        self.assertEqual(count["060"], 3)
+        self.assertEqual(refs["BHZ"], refs["BHN"])
+        self.assertNotEqual(refs["BHZ"], refs["BHE"])
+
+
+class RecordBuilderTest(unittest.TestCase):
+    def test_buffer(self):
+        # more than _IO_RECORDS records, with blockettes crossing the
+        # boundary of the buffer and blockettes continuing over many
+        # records
+        fd = io.BytesIO()
+        rb = fseed._RecordBuilder("A", fd, 8)
+        blks = []
+
+        for i in range(1500):
+            n = 10 + i * 37 % 300
+            blks.append("03%d%4d" % (i % 10, n) + chr(65 + i % 26) * (n - 7))
+
+        blks.insert(700, "0399999" + "#" * 9992)
+        blks.insert(701, "0399999" + "$" * 9992)
+        blks.insert(702, "0399999" + "%" * 9992)
+
+        for (i, blk) in enumerate(blks):
+            if i == 1000:
+                rb.reset("S", fd, 5000)
+
+            rb.write_blk(blk)
+
+        rb.flush()
+
+        data = fd.getvalue()
+        nrec = len(data) >> 8
+        self.assertEqual(len(data) % 256, 0)
+        self.assertTrue(nrec > 3 * fseed._IO_RECORDS)
+        recnos = [int(data[p:p+6]) for p in range(0, len(data), 256)]
+        types = "".join(data[p+6] for p in range(0, len(data), 256))
+        self.assertEqual(types, "A" * types.index("S") + "S" *
+            (nrec - types.index("S")))
+
+        self.assertEqual(recnos, range(1, types.index("S") + 1) +
+            range(5000, 5000 + nrec - types.index("S")))
+
+        self.assertEqual(rb.get_recno(), recnos[-1] + 1)
+        self.assertEqual(sum((blockettes(text) for (recno, rectype, text)
+            in split_headers(data, 8)), []), blks)
+
+
+class CopyRecordsTest(unittest.TestCase):
+    def spool(self, nblk):
+        # station headers of 2000-byte blockettes, which continue over
+        # several 512-byte records
+        fd = tempfile.TemporaryFile()
+        rb = fseed._RecordBuilder("S", fd, 9)
+
+        for i in range(nblk):
+            rb.write_blk("050%4d" % 2000 + chr(65 + i % 26) * 1993)
+            rb.flush()
+
+        return fd
+
+    def test_copy(self):
+        fd = self.spool(100)
+        nrec = fd.tell() >> 9
+        self.assertTrue(nrec > fseed._IO_RECORDS)
+
+        for recno in (7, 999990):
+            dest = io.BytesIO()
+            self.assertEqual(fseed._copy_records(fd, dest, recno, 9),
+                recno + nrec)
+
+            data = dest.getvalue()
+            fd.seek(0)
+            src = fd.read()
+            self.assertEqual(len(data), len(src))
+
+            for i in range(nrec):
+                p = i << 9
+                self.assertEqual(data[p:p+6], b"%06d" % ((recno + i) %
+                    1000000))
+
+                # record type, continuation flag and contents are kept
+                self.assertEqual(data[p+6:p+512], src[p+6:p+512])
+
+            self.assertEqual([data[p+7] for p in range(0, len(data), 512)],
+                ([" "] + 3 * ["*"]) * 100)
+
+    def test_truncated(self):
+        fd = self.spool(1)
+        fd.write(b" " * 100)
+        self.assertRaises(fseed.SEEDError, fseed._copy_records, fd,
+            io.BytesIO(), 1, 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
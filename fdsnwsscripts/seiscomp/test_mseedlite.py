@@ -0,0 +1,499 @@
+import io
+import struct
+import tempfile
+import datetime
+import unittest
+
+from fdsnwsscripts.seiscomp import mseedlite, logs
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+
+def make_record(seqno, sta, cha, start, samprate, samples, rec_len_exp=9,
+                encoding=11, x_minus1=None, net="XX", loc=""):
+    """Build a miniSEED 2 record with blockettes 1000 and 1001 that holds
+    as many of samples as fit; returns (record, number of samples)"""
+
+    (frames, nsamp, nframes) = mseedlite.steim_encode(samples, encoding,
+        ((1 << rec_len_exp) - 64) // 64, x_minus1)
+
+    t = start.timetuple()
+    head = struct.pack(">6s2c5s2s3s2s2H3Bx2H2h4Bl2H",
+        ("%06d" % seqno).encode(), b"D", b" ", sta.ljust(5).encode(),
+        loc.ljust(2).encode(), cha.ljust(3).encode(), net.ljust(2).encode(),
+        start.year, t.tm_yday, start.hour, start.minute, start.second,
+        start.microsecond // 100, nsamp, samprate, 1, 0, 0, 0, 2, 0, 64, 48)
+
+    head += struct.pack(">2H3Bx", 1000, 56, encoding, 1, rec_len_exp)
+    # the number of frames of records longer than 16 KiB does not fit
+    head += struct.pack(">2HBbxB", 1001, 0, 0, start.microsecond % 100,
+        nframes if nframes < 256 else 0)
+
+    data = frames + b"\0" * ((1 << rec_len_exp) - 64 - len(frames))
+    return (head + data, nsamp)
+
+
+def make_ms3_record(sid, start, samprate, samples, max_frames=7,
+                    encoding=11):
+    """Build a miniSEED 3 record; returns (record, number of samples)"""
+
+    (frames, nsamp, nframes) = mseedlite.steim_encode(samples, encoding,
+        max_frames)
+
+    t = start.timetuple()
+    head = struct.pack("<2sBBIHHBBBBdIIBBHI", b"MS", 3, 0,
+        start.microsecond * 1000, start.year, t.tm_yday, start.hour,
+        start.minute, start.second, encoding, samprate, nsamp, 0, 2,
+        len(sid), 0, len(frames))
+
+    return (head + sid.encode() + frames, nsamp)
+
+
+def make_stream(sta, cha, start, samprate, samples, rec_len_exp=9,
+                encoding=11, net="XX", loc=""):
+    """Split samples into consecutive records; returns a list of records"""
+
+    recs = []
+    pos = 0
+    x_minus1 = None
+
+    # at most 7 samples per word, 15 words per frame
+    maxsamp = ((1 << rec_len_exp) - 64) // 64 * 105
+
+    while pos < len(samples):
+        t = start + datetime.timedelta(microseconds=int(round(pos * 1000000.0
+            / samprate)))
+
+        (rec, nsamp) = make_record(len(recs) + 1, sta, cha, t, samprate,
+            samples[pos:pos + maxsamp], rec_len_exp, encoding, x_minus1,
+            net, loc)
+
+        recs.append(rec)
+        x_minus1 = int(samples[pos + nsamp - 1])
+        pos += nsamp
+
+    return recs
+
+
+def random_walk(n, seed, step=1000):
+    return numpy.cumsum(numpy.random.RandomState(seed).randint(-step, step,
+        n)).astype('i4')
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class SteimTest(unittest.TestCase):
+    def round_trip(self, samples, encoding, max_frames=7):
+        samples = numpy.asarray(samples, dtype='i4')
+        pos = 0
+        x_minus1 = None
+
+        while pos < len(samples):
+            (frames, nsamp, nframes) = mseedlite.steim_encode(samples[pos:],
+                encoding, max_frames, x_minus1)
+
+            self.assertTrue(0 < nsamp <= len(samples) - pos)
+            self.assertTrue(0 < nframes <= max_frames)
+            self.assertEqual(len(frames), nframes * 64)
+
+            decoded = mseedlite.steim_decode(frames, nsamp, encoding)
+            self.assertEqual(decoded.dtype, numpy.dtype('i4'))
+            self.assertEqual(decoded.tolist(),
+                samples[pos:pos + nsamp].tolist())
+
+            x_minus1 = int(samples[pos + nsamp - 1])
+            pos += nsamp
+
+    def test_small_differences(self):
+        for encoding in (10, 11):
+            self.round_trip(random_walk(3000, 1, 8), encoding)
+
+    def test_mixed_differences(self):
+        # differences of all sizes that fit into Steim2
+        rnd = numpy.random.RandomState(2)
+        samples = rnd.randint(-(1 << 28), 1 << 28, 3000) >> \
+            rnd.randint(0, 29, 3000)
+
+        for encoding in (10, 11):
+            self.round_trip(samples, encoding)
+
+    def test_steim1_extremes(self):
+        self.round_trip([0, 2147483647, 0, -2147483648, -1, 1] * 50, 10)
+
+    def test_constant(self):
+        for encoding in (10, 11):
+            self.round_trip([-5] * 1000, encoding, 1)
+
+    def test_steim2_overflow(self):
+        self.assertRaises(mseedlite.MSeedError, mseedlite.steim_encode,
+            [0, 1 << 29], 11, 7)
+
+    def test_large_record(self):
+        samples = random_walk(60000, 4)
+        recs = make_stream("ABC", "HHZ", datetime.datetime(2020, 1, 1), 100,
+            samples, 16)
+
+        self.assertEqual([len(raw) for raw in recs], [65536] * len(recs))
+        decoded = []
+
+        for (rec, raw) in zip(mseedlite.Input(io.BytesIO(b"".join(recs))),
+                recs):
+            self.assertEqual(rec.size, 65536)
+            self.assertTrue(rec.nframes > 255)
+            decoded.append(rec.get_samples())
+
+            fd = io.BytesIO()
+            rec.write(fd, 16)
+            self.assertEqual(fd.getvalue(), raw)
+
+        self.assertEqual(numpy.concatenate(decoded).tolist(),
+            samples.tolist())
+
+    def test_record_samples(self):
+        samples = random_walk(1000, 3)
+        recs = make_stream("ABC", "HHZ", datetime.datetime(2020, 1, 1), 100,
+            samples, 9, 10)
+
+        decoded = [rec.get_samples()
+            for rec in mseedlite.Input(io.BytesIO(b"".join(recs)))]
+
+        self.assertEqual(numpy.concatenate(decoded).tolist(),
+            samples.tolist())
+
+
+class WriteTest(unittest.TestCase):
+    def test_no_data(self):
+        # blockettes 1000 and 2000 without data offset; the record has no
+        # data section
+        head = struct.pack(">6s2c5s2s3s2s2H3Bx2H2h4Bl2H", b"000001", b"D",
+            b" ", b"ABC  ", b"  ", b"LOG", b"XX", 2020, 1, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 2, 0, 0, 48)
+
+        head += struct.pack(">2H3Bx", 1000, 56, 0, 1, 8)
+        head += struct.pack(">2H2HB3B", 2000, 0, 200, 15, 0, 1, 0, 0)
+        raw = head + b"x" * (256 - len(head))
+
+        rec = mseedlite.Record(raw)
+        self.assertEqual((rec.size, len(rec.header), len(rec.data)),
+            (256, 256, 0))
+
+        fd = io.BytesIO()
+        rec.write(fd, 8)
+        self.assertEqual(fd.getvalue(), raw)
+
+    def test_short_data(self):
+        # a record with a few bytes of ASCII data
+        head = struct.pack(">6s2c5s2s3s2s2H3Bx2H2h4Bl2H", b"000001", b"D",
+            b" ", b"ABC  ", b"  ", b"LOG", b"XX", 2020, 1, 0, 0, 0, 0, 8, 0,
+            0, 0, 0, 0, 1, 0, 248, 48)
+
+        head += struct.pack(">2H3Bx", 1000, 0, 0, 1, 8)
+        raw = head + b"\0" * (248 - len(head)) + b"message\n"
+
+        rec = mseedlite.Record(raw)
+        fd = io.BytesIO()
+        rec.write(fd, 8)
+        self.assertEqual(fd.getvalue(), raw)
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class MiniSEED3Test(unittest.TestCase):
+    def test_round_trip(self):
+        start = datetime.datetime(2020, 2, 29, 23, 59, 59, 123456)
+        samples = random_walk(1000, 1)
+        (raw, nsamp) = make_ms3_record("FDSN:XX_ABC_00_H_H_Z", start, 100.0,
+            samples)
+
+        with tempfile.TemporaryFile() as fd:
+            fd.write(raw + raw)
+            fd.seek(0)
+            recs = list(mseedlite.Input(fd, True))
+            fd.seek(0)
+            recs += list(mseedlite.Input(fd))
+
+        self.assertEqual(len(recs), 4)
+
+        for rec in recs:
+            self.assertEqual(rec.version, 3)
+            self.assertEqual((rec.net, rec.sta, rec.loc, rec.cha),
+                ("XX", "ABC", "00", "HHZ"))
+
+            self.assertEqual(rec.rectype, "D")
+            self.assertEqual(rec.size, len(raw))
+            self.assertEqual(bytes(rec.header) + bytes(rec.data), raw)
+            self.assertEqual(rec.begin_time, start)
+            self.assertEqual(rec.end_ns - rec.begin_ns, nsamp * 10000000)
+            self.assertEqual(rec.fsamp, 100.0)
+            self.assertEqual(rec.get_samples().tolist(),
+                samples[:nsamp].tolist())
+
+            self.assertRaises(mseedlite.MSeedError, rec.write, io.BytesIO(),
+                12)
+
+    def test_extended_channel(self):
+        (raw, nsamp) = make_ms3_record("FDSN:XX_ABC__L_HH_Z",
+            datetime.datetime(2020, 1, 1), -10.0, random_walk(100, 2))
+
+        rec = mseedlite.Record(raw)
+        self.assertEqual((rec.loc, rec.cha), ("", "L_HH_Z"))
+        self.assertEqual(rec.fsamp, 0.1)
+
+    def test_resync(self):
+        saved_warning = logs.warning
+        logs.warning = lambda s: None
+
+        start = datetime.datetime(2020, 1, 1)
+        recs = make_stream("ABC", "HHZ", start, 100, random_walk(2000, 3))
+        (ms3, nsamp) = make_ms3_record("FDSN:XX_DEF__H_H_Z", start, 100.0,
+            random_walk(500, 4))
+
+        garbage = b"\xff" * 100
+        buf = recs[0] + garbage + ms3 + b"".join(recs[1:])
+
+        try:
+            for mapped in (False, True):
+                with tempfile.TemporaryFile() as fd:
+                    fd.write(buf)
+                    fd.seek(0)
+                    inp = mseedlite.Input(fd, mapped, resync=True)
+                    out = [bytes(rec.header) + bytes(rec.data) for rec in inp]
+
+                self.assertEqual(out, recs[:1] + [ms3] + recs[1:])
+                self.assertEqual(inp.skipped, [(len(recs[0]),
+                    len(recs[0]) + len(garbage))])
+
+        finally:
+            logs.warning = saved_warning
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class HeaderOnlyTest(unittest.TestCase):
+    def setUp(self):
+        self.recs = make_stream("ABC", "HHZ", datetime.datetime(2020, 1, 1),
+            100, random_walk(3000, 1))
+
+    def test_read_data(self):
+        fd = io.BytesIO(b"".join(self.recs))
+        recs = list(mseedlite.Input(fd, header_only=True))
+        self.assertEqual(len(recs), len(self.recs))
+
+        for (rec, raw) in zip(recs, self.recs):
+            self.assertEqual(bytes(rec.header), raw[:64])
+            self.assertIsNone(rec.data)
+            self.assertRaises(mseedlite.MSeedError, getattr, rec, "X0")
+            self.assertRaises(mseedlite.MSeedError, rec.get_samples)
+
+        # the data is read from the given file, wherever it is positioned
+        fd.seek(100)
+        for (rec, raw) in zip(reversed(recs), reversed(self.recs)):
+            self.assertEqual(rec.read_data(fd), raw[64:])
+            self.assertEqual(fd.tell(), 100)
+
+        full = list(mseedlite.Input(io.BytesIO(b"".join(self.recs))))
+        for (rec, ref) in zip(recs, full):
+            self.assertEqual((rec.X0, rec.Xn, rec.nframes),
+                (ref.X0, ref.Xn, ref.nframes))
+
+    def test_not_seekable(self):
+        # without seek(), the data is read together with the header
+        class Pipe(object):
+            def __init__(self, data):
+                self.read = io.BytesIO(data).read
+
+        fd = Pipe(b"".join(self.recs))
+
+        for (rec, raw) in zip(mseedlite.Input(fd, header_only=True),
+                self.recs):
+            self.assertEqual(bytes(rec.header) + bytes(rec.data), raw)
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class ResyncTest(unittest.TestCase):
+    def setUp(self):
+        self.warnings = []
+        self.saved_warning = logs.warning
+        logs.warning = self.warnings.append
+
+        self.recs = make_stream("ABC", "HHZ", datetime.datetime(2020, 1, 1),
+            100, random_walk(3000, 1))
+
+    def tearDown(self):
+        logs.warning = self.saved_warning
+
+    def read(self, buf, mapped):
+        """Return the records read from buf and the skipped ranges"""
+
+        if mapped:
+            fd = tempfile.TemporaryFile()
+            fd.write(buf)
+            fd.seek(0)
+
+        else:
+            fd = io.BytesIO(buf)
+
+        try:
+            inp = mseedlite.Input(fd, mapped, resync=True)
+            recs = [bytes(rec.header) + bytes(rec.data) for rec in inp]
+
+        finally:
+            fd.close()
+
+        return (recs, inp.skipped)
+
+    def test_garbage(self):
+        # plain garbage and garbage with a plausible record header
+        garbage = [b"\xff" * 100, b"000000D " + b"\x01" * 300]
+        buf = self.recs[0] + garbage[0] + b"".join(self.recs[1:3]) + \
+            garbage[1] + b"".join(self.recs[3:])
+
+        start0 = len(self.recs[0])
+        start1 = start0 + len(garbage[0]) + len(self.recs[1]) + \
+            len(self.recs[2])
+
+        for mapped in (False, True):
+            (recs, skipped) = self.read(buf, mapped)
+            self.assertEqual(recs, self.recs)
+            self.assertEqual(skipped, [(start0, start0 + len(garbage[0])),
+                (start1, start1 + len(garbage[1]))])
+
+        self.assertEqual(len(self.warnings), 4)
+
+    def test_corrupt_header(self):
+        bad = bytearray(self.recs[2])
+        bad[6:7] = b"X"
+        buf = b"".join(self.recs[:2]) + bytes(bad) + b"".join(self.recs[3:])
+        start = len(self.recs[0]) + len(self.recs[1])
+
+        for mapped in (False, True):
+            (recs, skipped) = self.read(buf, mapped)
+            self.assertEqual(recs, self.recs[:2] + self.recs[3:])
+            self.assertEqual(skipped, [(start, start + len(bad))])
+
+    def test_trailing_garbage(self):
+        buf = b"".join(self.recs) + b"\xff" * 10
+
+        for mapped in (False, True):
+            (recs, skipped) = self.read(buf, mapped)
+            self.assertEqual(recs, self.recs)
+            self.assertEqual(skipped, [(len(buf) - 10, len(buf))])
+
+    def test_no_resync(self):
+        buf = self.recs[0] + b"\xff" * 100 + self.recs[1]
+        inp = mseedlite.Input(io.BytesIO(buf))
+        self.assertRaises(mseedlite.MSeedError, list, inp)
+
+    def test_reader(self):
+        # reads and push-backs of _ResyncReader against a plain buffer
+        data = bytes(bytearray(i % 251 for i in range(100000)))
+        reader = mseedlite._ResyncReader(io.BytesIO(data))
+        rnd = numpy.random.RandomState(5)
+        pos = 0
+
+        while pos < len(data):
+            size = int(rnd.randint(1, 70000))
+            chunk = reader.read(size)
+            self.assertEqual(chunk, data[pos:pos + size])
+            pos += len(chunk)
+
+            if rnd.randint(2):
+                n = int(rnd.randint(0, len(chunk) + 1))
+                reader.unread(chunk[len(chunk) - n:])
+                pos -= n
+
+            self.assertEqual(reader.pos, pos)
+
+        self.assertEqual(reader.read(10), b"")
+
+    def test_many_records(self):
+        # many records following garbage are read from the pushed back
+        # data
+        recs = make_stream("ABC", "HHZ", datetime.datetime(2020, 1, 1), 100,
+            random_walk(100000, 2))
+
+        buf = b"\xff" * 1000 + b"".join(recs)
+        (out, skipped) = self.read(buf, False)
+        self.assertEqual(out, recs)
+        self.assertEqual(skipped, [(0, 1000)])
+
+    def test_find_record(self):
+        buf = b"".join(self.recs)
+        self.assertEqual(mseedlite.find_record(buf, 0), 0)
+        self.assertEqual(mseedlite.find_record(buf, 1), len(self.recs[0]))
+
+        # a record is only accepted if the next one can be parsed as well
+        buf = self.recs[0] + b"\xff" * 100 + b"".join(self.recs[1:])
+        start = len(self.recs[0]) + 100
+
+        self.assertEqual(mseedlite.find_record(buf, 0), start)
+        self.assertEqual(mseedlite.find_record(buf, start), start)
+        self.assertEqual(mseedlite.find_record(buf, len(buf) - 1), len(buf))
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class HeaderIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.warnings = []
+        self.saved_warning = logs.warning
+        logs.warning = self.warnings.append
+
+    def tearDown(self):
+        logs.warning = self.saved_warning
+
+    def check_index(self, buf):
+        index = mseedlite.header_index(buf)
+        recs = list(mseedlite.Input(io.BytesIO(buf)))
+        self.assertEqual(len(index), len(recs))
+
+        offset = 0
+        for (i, rec) in zip(index, recs):
+            self.assertEqual(i['offset'], offset)
+            self.assertEqual((i['net'].decode(), i['sta'].decode(),
+                i['loc'].decode(), i['cha'].decode()),
+                (rec.net, rec.sta, rec.loc, rec.cha))
+            self.assertEqual(i['starttime'], rec.begin_ns)
+            self.assertEqual(i['nsamp'], rec.nsamp)
+            self.assertEqual(i['samprate'], rec.fsamp)
+            self.assertEqual(i['encoding'], rec.encoding)
+            self.assertEqual(i['reclen'], rec.size)
+            offset += rec.size
+
+        return index
+
+    def test_uniform(self):
+        start = datetime.datetime(2020, 1, 1, 0, 0, 0, 123456)
+        buf = b"".join(make_stream("ABC", "HHZ", start, 100,
+            random_walk(5000, 1)) + make_stream("DEF", "BHZ", start, 20,
+            random_walk(1000, 2)))
+
+        self.assertIsNotNone(mseedlite._uniform_records(
+            numpy.frombuffer(buf, 'u1')))
+        self.check_index(buf)
+        self.assertEqual(self.warnings, [])
+
+    def test_mixed_lengths(self):
+        start = datetime.datetime(2021, 2, 28, 23, 59, 59)
+        buf = b"".join(make_stream("ABC", "HHZ", start, 100,
+            random_walk(3000, 3), 9) + make_stream("ABC", "LHZ", start, 1,
+            random_walk(3000, 4), 12))
+
+        self.check_index(buf)
+        self.assertEqual(self.warnings, [])
+
+    def test_incomplete_record(self):
+        start = datetime.datetime(2020, 1, 1)
+        recs = make_stream("ABC", "HHZ", start, 100, random_walk(2000, 5))
+        buf = b"".join(recs)
+
+        for cut in (1, 47, 100, 511):
+            index = mseedlite.header_index(buf + recs[0][:cut])
+            self.assertEqual(len(index), len(recs))
+            self.assertEqual(index['offset'][-1], len(buf) - len(recs[-1]))
+
+        self.assertEqual(len(self.warnings), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
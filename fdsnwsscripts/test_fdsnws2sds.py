@@ -0,0 +1,222 @@
+import os
+import sys
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from fdsnwsscripts import fdsnws2sds
+from fdsnwsscripts.seiscomp import mseedlite, logs
+from fdsnwsscripts.seiscomp.test_mseedlite import make_stream, random_walk
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+NS = fdsnws2sds.NS
+
+
+class WindowTest(unittest.TestCase):
+    def test_byte_budget(self):
+        ts = fdsnws2sds.Timespan(0, 86400 * NS, 100.0)
+        self.assertEqual(ts.window(1440, 2000000), 10000 * NS)
+        self.assertEqual(ts.window(60, None), 3600 * NS)
+
+        # channels without sample rate use the timespan
+        ts = fdsnws2sds.Timespan(0, 86400 * NS, 0.0)
+        self.assertEqual(ts.window(60, 2000000), 3600 * NS)
+
+    def test_end(self):
+        ts = fdsnws2sds.Timespan(5 * NS, 10 * NS, 1.0)
+        self.assertEqual(ts.window(1440, 1000000), 10 * NS)
+
+    def test_minimum(self):
+        # a budget too small for a single sample still advances the window
+        ts = fdsnws2sds.Timespan(0, 86400 * NS, 1000.0)
+        self.assertEqual(ts.window(1440, 1), NS)
+        self.assertEqual(ts.window(0, None), NS)
+
+
+class ScanTest(unittest.TestCase):
+    def setUp(self):
+        self.errors = []
+        self.saved_error = logs.error
+        logs.error = self.errors.append
+        self.sds = tempfile.mkdtemp()
+
+    def tearDown(self):
+        logs.error = self.saved_error
+        shutil.rmtree(self.sds)
+
+    def test_invalid_file(self):
+        d = self.sds + "/2020/XX/ABC/HHZ.D"
+        os.makedirs(d)
+        open(d + "/README", "w").close()
+
+        nets = set()
+        fdsnws2sds.scan_sds(self.sds, {}, nets)
+        self.assertEqual(self.errors, ["invalid SDS file: " + d + "/README"])
+        self.assertEqual(nets, set())
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class IngestTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = self.dir + "/XX.ABC..HHZ.D.2020.001"
+        self.recs = make_stream("ABC", "HHZ", datetime.datetime(2020, 1, 1),
+            100, random_walk(5000, 1))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def ingest(self, recs):
+        # spool the records like main() and merge them into the day file
+        spool = self.dir + "/spool"
+
+        with open(spool, "wb") as fd:
+            fd.write(b"".join(recs))
+
+        chunks = []
+        offset = 0
+
+        for rec in recs:
+            chunks.append((offset, len(rec)))
+            offset += len(rec)
+
+        fdsnws2sds.ingest_day((self.path, spool, chunks))
+
+    def read(self):
+        with open(self.path, "rb") as fd:
+            return fd.read()
+
+    def test_sorted(self):
+        self.ingest(self.recs[5:] + self.recs[:6] + self.recs[2:3])
+        self.assertEqual(self.read(), b"".join(self.recs))
+
+    def test_append(self):
+        self.ingest(self.recs[:4])
+        ino = os.stat(self.path).st_ino
+
+        # later records are appended without rewriting the file
+        self.ingest(self.recs[4:])
+        self.assertEqual(self.read(), b"".join(self.recs))
+        self.assertEqual(os.stat(self.path).st_ino, ino)
+
+    def test_merge(self):
+        self.ingest(self.recs[::2])
+        self.ingest(self.recs[1::2] + self.recs[:3])
+        self.assertEqual(self.read(), b"".join(self.recs))
+
+    def test_unchanged(self):
+        self.ingest(self.recs)
+        ino = os.stat(self.path).st_ino
+        self.ingest(self.recs[3:5])
+        self.assertEqual(self.read(), b"".join(self.recs))
+        self.assertEqual(os.stat(self.path).st_ino, ino)
+
+    def test_empty_file(self):
+        open(self.path, "wb").close()
+        self.ingest(self.recs[3:] + self.recs[:3])
+        self.assertEqual(self.read(), b"".join(self.recs))
+
+
+# stands in for fdsnws_fetch: returns the channel list for station
+# requests and the records of data.mseed that start within the requested
+# windows for dataselect requests
+FETCH = """#!%s
+import sys
+sys.path.insert(0, %r)
+from fdsnwsscripts import fdsnws2sds
+from fdsnwsscripts.seiscomp import mseedlite
+
+d = sys.argv[0].rsplit('/', 1)[0]
+out = getattr(sys.stdout, 'buffer', sys.stdout)
+
+if 'station' in sys.argv:
+    out.write(b'#Network|Station|Location|Channel|Latitude|Longitude|'
+              b'Elevation|Depth|Azimuth|Dip|SensorDescription|Scale|'
+              b'ScaleFreq|ScaleUnits|SampleRate|StartTime|EndTime\\n'
+              b'XX|ABC||LHZ|0|0|0|0|0|-90|S|1|1|M/S|1|'
+              b'2020-01-01T20:00:00|2020-01-02T04:00:00\\n')
+
+elif 'dataselect' in sys.argv:
+    windows = []
+
+    for line in sys.stdin:
+        tokens = line.split()
+        windows.append((fdsnws2sds.parse_time(tokens[4]),
+                        fdsnws2sds.parse_time(tokens[5])))
+
+    with open(d + '/data.mseed', 'rb') as fd:
+        for rec in mseedlite.Input(fd):
+            for (start, end) in windows:
+                if start <= rec.begin_ns < end:
+                    out.write(bytes(rec.header) + bytes(rec.data))
+                    break
+"""
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class MainTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.saved = (sys.argv, sys.path[0], logs.error, logs.warning,
+            logs.notice, logs.info, logs.debug)
+
+        # the records cross midnight
+        self.recs = make_stream("ABC", "LHZ",
+            datetime.datetime(2020, 1, 1, 22, 30), 1, random_walk(12000, 1))
+
+        with open(self.dir + "/data.mseed", "wb") as fd:
+            fd.write(b"".join(self.recs))
+
+        with open(self.dir + "/fdsnws_fetch", "w") as fd:
+            fd.write(FETCH % (sys.executable,
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+        os.chmod(self.dir + "/fdsnws_fetch", 0o755)
+
+    def tearDown(self):
+        (sys.argv, sys.path[0], logs.error, logs.warning, logs.notice,
+            logs.info, logs.debug) = self.saved
+
+        shutil.rmtree(self.dir)
+
+    def run_main(self, *args):
+        sys.argv = ["fdsnws2sds", "-z", "-o", self.dir + "/sds"] + list(args)
+        sys.path[0] = self.dir
+        return fdsnws2sds.main()
+
+    def check_sds(self):
+        days = {}
+
+        for raw in self.recs:
+            day = mseedlite.Record(raw).begin_time.strftime("%Y.%j")
+            days[day] = days.get(day, b"") + raw
+
+        for (day, data) in days.items():
+            path = "%s/sds/%s/XX/ABC/LHZ.D/XX.ABC..LHZ.D.%s" % (self.dir,
+                day[:4], day)
+
+            with open(path, "rb") as fd:
+                self.assertEqual(fd.read(), data)
+
+    def test_download(self):
+        # many short windows, merged into two day files
+        self.assertEqual(self.run_main("-m", "60"), 0)
+        self.check_sds()
+
+    def test_processes(self):
+        self.assertEqual(self.run_main("-B", "8000", "-j", "2"), 0)
+        self.check_sds()
+
+        # nothing new to download
+        self.assertEqual(self.run_main(), 0)
+        self.check_sds()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import sys
+import unittest
+
+if sys.version_info[0] >= 3:
+    raise unittest.SkipTest("fdsnws2seed requires Python 2")
+
+from fdsnwsscripts import fdsnws2seed
+from fdsnwsscripts.seiscomp import fdsnxml, fseed
+from fdsnwsscripts.seiscomp.test_fseed import make_stationxml, \
+    make_channel, split_headers, blockettes
+
+
+def abbreviations(data):
+    """Return the network descriptions of blockette 33 in the order of
+    their keys; the network of each station is checked"""
+
+    desc = {}
+    stations = []
+
+    for (recno, rectype, text) in split_headers(data):
+        for blk in blockettes(text):
+            if blk.startswith("033"):
+                desc[int(blk[7:10])] = blk[10:-1]
+
+            elif blk.startswith("050"):
+                p = blk.index("~", 47)
+                stations.append((int(blk[p+1:p+4]), blk[-2:]))
+
+    for (key, net_code) in stations:
+        assert desc[key] == "Network " + net_code
+
+    return [desc[key] for key in sorted(set(key for (key, _) in stations))]
+
+
+class AbbreviationTest(unittest.TestCase):
+    def setUp(self):
+        # the networks are not sorted
+        self.xml = make_stationxml([
+            ("ZZ", [("APE", [make_channel("LHZ", 1.0)])]),
+            ("GE", [("APE", [make_channel("BH" + c, 20.0) for c in "ZNE"]),
+                ("BOAB", [make_channel("HHZ", 100.0, loc="00")])]),
+            ("CH", [("ABC", [make_channel("HHZ", 100.0)])])])
+
+    def volume(self, incremental):
+        inv = fdsnxml.Inventory()
+        vol = fseed.SEEDVolume(inv, "TEST", "test", False)
+
+        if incremental:
+            for net_code in inv.iterload_fdsnxml(io.BytesIO(self.xml)):
+                fdsnws2seed.add_inventory(vol, inv)
+                vol.spool_stations()
+                inv.clear()
+
+        else:
+            inv.load_fdsnxml(io.BytesIO(self.xml))
+            fdsnws2seed.add_inventory(vol, inv)
+
+        fd = io.BytesIO()
+        vol.output(fd)
+        return fd.getvalue()
+
+    def test_order(self):
+        # sorted by network code, unless the volume is created one
+        # network at a time
+        self.assertEqual(abbreviations(self.volume(False)),
+            ["Network CH", "Network GE", "Network ZZ"])
+
+        self.assertEqual(abbreviations(self.volume(True)),
+            ["Network ZZ", "Network GE", "Network CH"])
+
+
+if __name__ == "__main__":
+    unittest.main()
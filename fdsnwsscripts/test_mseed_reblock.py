@@ -0,0 +1,82 @@
+import io
+import datetime
+import unittest
+
+from fdsnwsscripts import mseed_reblock
+from fdsnwsscripts.seiscomp import mseedlite
+from fdsnwsscripts.seiscomp.test_mseedlite import make_stream, random_walk
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class ReblockTest(unittest.TestCase):
+    def reblock(self, buf, rec_len_exp=12):
+        out = io.BytesIO()
+        records = mseedlite.reblock(mseedlite.Input(io.BytesIO(buf)),
+            rec_len_exp)
+
+        nrec = mseed_reblock.write_records(records, out, rec_len_exp)
+        recs = list(mseedlite.Input(io.BytesIO(out.getvalue())))
+        self.assertEqual(len(recs), nrec)
+        return (out.getvalue(), recs)
+
+    def samples(self, recs):
+        result = {}
+
+        for rec in recs:
+            result.setdefault(rec.cha, []).extend(rec.get_samples().tolist())
+
+        return result
+
+    def test_samples_unchanged(self):
+        start = datetime.datetime(2020, 1, 1)
+        hhz = random_walk(20000, 1)
+        bhz = random_walk(4000, 2)
+        a = make_stream("ABC", "HHZ", start, 100, hhz, 9, 10)
+        b = make_stream("ABC", "BHZ", start, 20, bhz, 9, 11)
+
+        # interleave the channels
+        buf = b"".join(a[:10] + b + a[10:])
+        (out, recs) = self.reblock(buf)
+
+        self.assertEqual(self.samples(recs),
+            {"HHZ": hhz.tolist(), "BHZ": bhz.tolist()})
+
+        # only the last, short record of BHZ is not merged
+        self.assertEqual([rec.size for rec in recs if rec.size != 4096], [512])
+        self.assertTrue(len(out) < len(buf))
+
+        for (cha, first) in (("HHZ", a[0]), ("BHZ", b[0])):
+            times = [rec.begin_ns for rec in recs if rec.cha == cha]
+            self.assertEqual(times[0], mseedlite.Record(first).begin_ns)
+            self.assertEqual(times, sorted(times))
+
+    def test_gap_not_padded(self):
+        samples = random_walk(2000, 3)
+        a = make_stream("ABC", "HHZ", datetime.datetime(2020, 1, 1), 100,
+            samples)
+
+        # two records separated by a gap cannot be merged and keep their
+        # length
+        buf = a[0] + a[2]
+        (out, recs) = self.reblock(buf)
+
+        self.assertEqual(out, buf)
+        self.assertEqual([rec.size for rec in recs], [512, 512])
+
+    def test_larger_records(self):
+        samples = random_walk(5000, 4)
+        buf = b"".join(make_stream("ABC", "LHZ",
+            datetime.datetime(2020, 1, 1), 1, samples, 12))
+
+        (out, recs) = self.reblock(buf, 9)
+        self.assertEqual(out, buf)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import shutil
+import datetime
+import tempfile
+import unittest
+
+from fdsnwsscripts import mseed_stats
+from fdsnwsscripts.seiscomp import logs
+from fdsnwsscripts.seiscomp.test_mseedlite import make_stream, random_walk
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+NS = mseed_stats.NS
+
+
+@unittest.skipIf(numpy is None, "numpy not installed")
+class StatsTest(unittest.TestCase):
+    def setUp(self):
+        self.warnings = []
+        self.saved_warning = logs.warning
+        logs.warning = self.warnings.append
+        self.dir = tempfile.mkdtemp()
+
+        start = datetime.datetime(2020, 1, 1)
+        self.hhz = make_stream("ABC", "HHZ", start, 100,
+            random_walk(30000, 1))
+
+        self.lhz = make_stream("ABC", "LHZ", start, 1, random_walk(30000, 2),
+            12)
+
+    def tearDown(self):
+        logs.warning = self.saved_warning
+        shutil.rmtree(self.dir)
+
+    def write(self, recs):
+        path = self.dir + "/data.mseed"
+
+        with open(path, "wb") as fd:
+            fd.write(b"".join(recs))
+
+        return path
+
+    def scan(self, path, chunk_size):
+        stats = {}
+
+        for task in mseed_stats.split_file(path, chunk_size):
+            for (key, cs) in mseed_stats.scan_range(task).items():
+                try:
+                    stats[key].update(cs)
+
+                except KeyError:
+                    stats[key] = cs
+
+        return dict((key, (cs.records, cs.samples, cs.bytes,
+            cs.get_extents())) for (key, cs) in stats.items())
+
+    def test_split_file(self):
+        recs = self.hhz[:20] + self.lhz[:5] + self.hhz[20:]
+        path = self.write(recs)
+        bounds = set()
+        offset = 0
+
+        for raw in recs:
+            bounds.add(offset)
+            offset += len(raw)
+
+        chunks = mseed_stats.split_file(path, 3000)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(chunks[0][1], 0)
+        self.assertEqual(chunks[-1][2], offset)
+
+        for (a, b) in zip(chunks, chunks[1:]):
+            self.assertEqual(a[2], b[1])
+            self.assertTrue(b[1] in bounds)
+
+        self.assertEqual(mseed_stats.split_file(path, offset),
+            [(path, 0, offset)])
+
+    def test_chunked(self):
+        # mixed record lengths; chunks end in the middle of both
+        path = self.write(self.hhz[:30] + self.lhz[:3] + self.hhz[35:] +
+            self.hhz[40:45] + self.lhz[3:])
+
+        stats = self.scan(path, 1 << 30)
+        self.assertEqual(sorted(k[0][3] for k in stats), ["HHZ", "LHZ"])
+
+        for chunk_size in (512, 1000, 5000, 20000):
+            self.assertEqual(self.scan(path, chunk_size), stats)
+
+        self.assertEqual(self.warnings, [])
+
+    def test_extents(self):
+        t = [mseed_stats.mseedlite.Record(raw) for raw in self.hhz]
+        path = self.write(self.hhz[:10] + self.hhz[12:20] + self.hhz[18:])
+        ((key, (records, samples, nbytes, (extents, gaps, overlaps))),) = \
+            self.scan(path, 1 << 30).items()
+
+        self.assertEqual(key, (("XX", "ABC", "", "HHZ"), 100.0))
+        self.assertEqual(records, len(self.hhz))
+        self.assertEqual(nbytes, 512 * len(self.hhz))
+        self.assertEqual(extents, [(t[0].begin_ns, t[9].end_ns),
+            (t[12].begin_ns, t[-1].end_ns)])
+
+        self.assertEqual(gaps, [(t[9].end_ns, t[12].begin_ns)])
+        self.assertEqual(overlaps, [(t[18].begin_ns, t[19].end_ns)])
+
+    def test_tolerance(self):
+        cs = mseed_stats.ChannelStats(100.0)
+        cs.spans = [(0, 10 * NS), (10 * NS + NS // 300, 20 * NS),
+            (20 * NS - NS // 300, 30 * NS), (30 * NS + NS // 100, 40 * NS)]
+
+        self.assertEqual(cs.get_extents(), ([(0, 30 * NS),
+            (30 * NS + NS // 100, 40 * NS)],
+            [(30 * NS, 30 * NS + NS // 100)], []))
+
+    def test_control_records(self):
+        # a SEED control header is not reported as corrupt data
+        control = b"000002V " + b" " * 504
+        path = self.write(self.hhz[:1] + [control] + self.hhz[1:])
+
+        ((records, samples, nbytes, (extents, gaps, overlaps)),) = \
+            self.scan(path, 1 << 30).values()
+
+        self.assertEqual(records, len(self.hhz))
+        self.assertEqual(gaps, [])
+        self.assertEqual(self.warnings, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
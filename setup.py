@@ -60,6 +60,7 @@ setup(
         # that you indicate whether you support Python 2, Python 3 or both.
         'Programming Language :: Python :: 2',
         'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
         'Topic :: Scientific/Engineering'
     ],
 
@@ -81,7 +82,7 @@ setup(
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=['python-dateutil'],
 
-    python_requires='>=2.7, <3',
+    python_requires='>=2.7',
     # List additional groups of dependencies here (e.g. development
     # dependencies). You can install these using the following syntax,
     # for example:
@@ -114,5 +115,7 @@ setup(
         fdsnws2sds=fdsnwsscripts.fdsnws2sds:main
         fdsnws2seed=fdsnwsscripts.fdsnws2seed:main
         fdsnxml2arclink=fdsnwsscripts.fdsnxml2arclink:main
+        mseed_reblock=fdsnwsscripts.mseed_reblock:main
+        mseed_stats=fdsnwsscripts.mseed_stats:main
     '''
 )